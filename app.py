@@ -1,18 +1,57 @@
+import importlib
+from datetime import datetime
+
 import streamlit as st
-from pages import revenue_metrics, funnel_progression, rep_scorecards, pipegen_metrics, seller_performance
+
+import data_loader
+import profiler
+import result_cache
+
+# Tab label -> page module, imported only when its tab is selected.
+PAGES = {
+    "Revenue Metrics": "pages.revenue_metrics",
+    "Funnel Progression": "pages.funnel_progression",
+    "Rep Scorecards": "pages.rep_scorecards",
+    "Pipegen Metrics": "pages.pipegen_metrics",
+    "Seller Performance": "pages.seller_performance",
+}
 
 st.set_page_config(layout="wide")
 st.title("📊 EliseAI GTM Dashboard")
 
-tab = st.sidebar.radio("Select Tab", ["Revenue Metrics", "Funnel Progression", "Rep Scorecards", "Pipegen Metrics", "Seller Performance"])
-
-if tab == "Revenue Metrics":
-    revenue_metrics.render()
-elif tab == "Funnel Progression":
-    funnel_progression.render()
-elif tab == "Rep Scorecards":
-    rep_scorecards.render()
-elif tab == "Pipegen Metrics":
-    pipegen_metrics.render()
-elif tab == "Seller Performance":
-    seller_performance.render()
+tab = st.sidebar.radio("Select Tab", list(PAGES))
+
+# Register every ingest aggregate and per-version index before the first load builds them.
+importlib.import_module("cube")
+importlib.import_module("durations")
+importlib.import_module("filters")
+
+# Later changes to the data file are rebuilt in the background and swapped in between reruns.
+data_loader.start_refresh()
+
+
+def show_data_status():
+    status = data_loader.data_status()
+    st.sidebar.caption(
+        f"Data version {status['version']} · built {datetime.fromtimestamp(status['built_at']):%Y-%m-%d %H:%M:%S} · "
+        f"{status['rows']:,} rows" + (" · refreshing…" if status["refreshing"] else "")
+    )
+    if status["error"]:
+        st.sidebar.warning(f"Data refresh failed, serving the previous version: {status['error']}")
+    for path, error in status["source_errors"].items():
+        st.sidebar.warning(f"Skipped {path}: {error}")
+
+
+with st.sidebar.expander("🛠 Debug"):
+    profiling = st.checkbox("Profile renders", value=profiler.ENABLED)
+    stats = result_cache.CACHE.stats()
+    st.caption(
+        f"Result cache: {stats['hits']} hits · {stats['misses']} misses · {stats['evictions']} evictions · "
+        f"{stats['entries']} entries, {stats['bytes'] / 2**20:,.1f} MB"
+    )
+
+with profiler.profile_render(tab, enabled=profiling) as profile, data_loader.pinned():
+    show_data_status()  # of the version this rerun renders
+    importlib.import_module(PAGES[tab]).render()
+if profile:
+    profiler.render_panel(profile)
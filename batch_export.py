@@ -0,0 +1,88 @@
+"""Run page compute functions for many specs in parallel and export the results.
+
+SPECS is a JSON list of jobs, e.g.
+
+    [{"name": "enterprise_scorecard", "page": "rep_scorecards",
+      "spec": {"filters": {"Segment": ["Enterprise"]}}}]
+
+where ``page`` is a module in pages/ and ``spec`` is passed to its compute().
+Every frame a job returns is written to OUT/<name>/<result>.<format>. Usage:
+
+    python batch_export.py SPECS [--out exports] [--data data.csv] [--workers N] [--format csv|parquet]
+"""
+import argparse
+import importlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from data_loader import DATA_PATH, load_data
+
+_df = None
+
+
+def _init_worker(data_path):
+    global _df
+    _df = load_data(data_path)
+
+
+def _run_job(job, out_dir, fmt):
+    start = time.perf_counter()
+    page = importlib.import_module(f"pages.{job['page']}")
+    results = page.compute(_df, job.get("spec", {}))
+
+    job_dir = os.path.join(out_dir, job["name"])
+    os.makedirs(job_dir, exist_ok=True)
+    paths = []
+    for key, frame in results.items():
+        path = os.path.join(job_dir, f"{key}.{fmt}")
+        frame = frame.copy()
+        frame.columns = [str(c) for c in frame.columns]
+        if fmt == "parquet":
+            frame.to_parquet(path)
+        else:
+            frame.to_csv(path, index=not isinstance(frame.index, pd.RangeIndex))
+        paths.append(path)
+    return paths, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("specs")
+    parser.add_argument("--out", default="exports")
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    args = parser.parse_args()
+
+    with open(args.specs) as f:
+        jobs = json.load(f)
+    names = [job["name"] for job in jobs]
+    if len(set(names)) != len(names):
+        sys.exit("job names must be unique")
+
+    load_data(args.data)  # build the snapshot once so workers only memory-map it
+
+    failed = 0
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker, initargs=(args.data,)) as pool:
+        futures = {pool.submit(_run_job, job, args.out, args.format): job["name"] for job in jobs}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                paths, seconds = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"FAILED {name}: {e}", file=sys.stderr)
+                continue
+            print(f"{name}: {len(paths)} files in {seconds * 1000:.0f} ms")
+
+    if failed:
+        sys.exit(f"{failed} of {len(jobs)} jobs failed")
+
+
+if __name__ == "__main__":
+    main()
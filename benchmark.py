@@ -0,0 +1,117 @@
+"""Time load_data and each page's compute path on synthetic exports.
+
+Runs headless (no Streamlit server): page benchmarks call each page's
+compute() with a representative spec. Results are appended as JSON lines so runs from
+different releases can be compared. Usage:
+
+    python benchmark.py [--sizes 10000 100000 ...] [--repeat 3] [--out bench_results.jsonl]
+"""
+import argparse
+import importlib
+import json
+import os
+import platform
+import subprocess
+import time
+from datetime import datetime, timezone
+
+import pandas as pd
+
+import cube
+import data_loader
+import durations
+import filters
+import synthetic_data
+
+DATA_DIR = "bench_data"
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+
+# Benchmark name -> (page module, compute spec), mirroring typical sidebar states.
+PAGES = {
+    "revenue_metrics": ("revenue_metrics", {"filters": {"Segment": ["Enterprise"]}, "dims": ["Close Quarter", "Segment"]}),
+    "revenue_metrics/acv_range": ("revenue_metrics", {"filters": {"Segment": ["Enterprise"]}, "acv_range": (10_000, 200_000), "dims": ["Close Quarter", "Segment"]}),
+    "funnel_progression": ("funnel_progression", {}),
+    "pipegen_metrics": ("pipegen_metrics", {"dims": ["Source"]}),
+    "rep_scorecards": ("rep_scorecards", {}),
+    "seller_performance": ("seller_performance", {}),
+}
+
+
+def _best(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def _git_rev():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def dataset(rows):
+    path = os.path.join(DATA_DIR, f"opportunities_{rows}.csv")
+    if not os.path.exists(path):
+        synthetic_data.generate(rows, path)
+    return path
+
+
+def clear_snapshot(path):
+    for p in data_loader._snapshot_paths(path):
+        if os.path.exists(p):
+            os.remove(p)
+
+
+def run(sizes, repeat):
+    """Yield (rows, benchmark, best seconds) for every size and benchmark."""
+    for rows in sizes:
+        path = dataset(rows)
+
+        def cold():
+            clear_snapshot(path)
+            data_loader.read_data(path)
+
+        yield rows, "load_data/cold", _best(cold, repeat)
+        yield rows, "load_data/warm", _best(lambda: data_loader.read_data(path), repeat)
+        data_loader.load_data(path)
+        yield rows, "load_data/shared", _best(lambda: data_loader.load_data(path), repeat)
+
+        df = data_loader.load_data(path)
+        yield rows, "filter_index/build", _best(lambda: filters.FilterIndex(df), repeat)
+        yield rows, "cube/build", _best(lambda: cube.build_cube(df), repeat)
+        yield rows, "durations/build", _best(lambda: durations.build_sketches(df), repeat)
+        for name, (module, spec) in PAGES.items():
+            compute = importlib.import_module(f"pages.{module}").compute
+            compute(df, spec)  # warm the per-version index and cube, as on a Streamlit rerun
+            yield rows, name, _best(lambda: compute(df, spec), repeat)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out", default="bench_results.jsonl")
+    args = parser.parse_args()
+
+    context = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_rev": _git_rev(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "repeat": args.repeat,
+    }
+    with open(args.out, "a") as out:
+        for rows, name, seconds in run(args.sizes, args.repeat):
+            print(f"{rows:>11,}  {name:<28} {seconds * 1000:10.1f} ms")
+            out.write(json.dumps({**context, "rows": rows, "benchmark": name, "seconds": round(seconds, 6)}) + "\n")
+            out.flush()
+
+
+if __name__ == "__main__":
+    main()
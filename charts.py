@@ -0,0 +1,59 @@
+"""Chart sections built on demand, memoised per input frame and sized for the browser.
+
+Each chart sits in a stateful expander (``section``): opening or closing it
+reruns the page, and a closed section builds no figure and sends nothing.
+Figures are memoised on a hash of the aggregated frame they plot (``figure``),
+so sidebar states that aggregate to the same rows share one figure. Charts
+above DASHBOARD_MAX_POINTS points (default 2000) are drawn with WebGL where
+plotly has a WebGL trace (``render_mode``) and otherwise keep only their
+largest categories (``cap_points``).
+"""
+import hashlib
+import os
+
+import pandas as pd
+import streamlit as st
+
+import result_cache
+
+MAX_POINTS = int(os.environ.get("DASHBOARD_MAX_POINTS", 2000))
+
+
+def section(label, key, expanded=False):
+    """Expander whose ``.open`` tells whether its chart should be built on this run."""
+    return st.expander(label, expanded=expanded, key=key, on_change="rerun")
+
+
+def frame_key(frame):
+    """Hash of ``frame``'s column names, index and values."""
+    digest = hashlib.sha256("\0".join(map(str, frame.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(frame, index=True).to_numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+
+def figure(page, df, name, frame, build, **options):
+    """``build()``, memoised on the contents of ``frame`` and on ``options`` (everything else the figure depends on)."""
+    return result_cache.figure(page, df, {"frame": frame_key(frame), **options}, name, build)
+
+
+def render_mode(points, max_points=MAX_POINTS):
+    """plotly express ``render_mode`` for a scatter of ``points`` markers."""
+    return "webgl" if points > max_points else "svg"
+
+
+def cap_points(frame, columns, y, max_points=MAX_POINTS):
+    """Trim ``frame`` to at most ``max_points`` rows for a chart of ``y``.
+
+    The highest-cardinality of ``columns`` keeps only its values with the
+    largest total ``|y|``. Returns the rows and a note naming what was left
+    out (None if nothing was).
+    """
+    columns = [col for col in columns if col]
+    if len(frame) <= max_points or not columns:
+        return frame, None
+    by = max(columns, key=lambda col: frame[col].nunique())
+    totals = frame[y].abs().groupby(frame[by], observed=True).sum().sort_values(ascending=False, kind="stable")
+    rows = frame[by].value_counts().reindex(totals.index).cumsum()
+    kept = totals.index[:max(1, int((rows <= max_points).sum()))]
+    note = f"Showing the top {len(kept):,} of {len(totals):,} {by} values by {y}."
+    return frame[frame[by].isin(kept)], note
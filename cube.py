@@ -0,0 +1,151 @@
+import numpy as np
+import pandas as pd
+
+import duckdb_backend
+from data_loader import INGEST_AGGREGATES, PRECOMPUTE, per_version, widen
+from funnel import STAGES, stage_matrix
+from metrics import VALUE_COLUMNS, aggregate
+
+ACV_COLUMN = "Base Annual Contract Value"
+
+# Reference Quarter follows from the other two quarters, so it adds no cells.
+CUBE_DIMENSIONS = [
+    "Created Quarter", "Close Quarter", "Reference Quarter", "Opportunity Owner",
+    "Segment", "Type", "Source", "Inbound Type", "Deal Size Band", "Has ACV", "Source File",
+]
+QUARTER_DIMENSIONS = ["Created Quarter", "Close Quarter", "Reference Quarter"]
+
+# Additive measures stored per cube cell: name -> (value column, reduction).
+# Cubes are stored next to snapshots, so bump data_loader.SNAPSHOT_VERSION
+# whenever dimensions or measures change.
+MEASURES = {
+    "Row_Count": ("Is_Won", "count"),
+    "Win_Count": ("Is_Won", "sum"),
+    "ACV_Sum": (ACV_COLUMN, "sum"),
+    "ACV_Count": (ACV_COLUMN, "count"),
+    "Won_ACV_Sum": ("Won ACV", "sum"),
+    "Won_ACV_Count": ("Won ACV", "count"),
+    "Cycle_Sum": ("Sales Cycle (Days)", "sum"),
+    "Cycle_Count": ("Sales Cycle (Days)", "count"),
+    "Velocity_Sum": ("Deal Velocity (Days)", "sum"),
+    "Velocity_Count": ("Deal Velocity (Days)", "count"),
+    "Created_Count": ("Created Date", "count"),
+    "AE_Outbound_ACV_Sum": ("AE Outbound ACV", "sum"),
+    "SDR_Outbound_ACV_Sum": ("SDR Outbound ACV", "sum"),
+    "Marketing_ACV_Sum": ("Marketing ACV", "sum"),
+    # Funnel stage reached, one count per funnel.STAGES entry
+    **{stage: (stage, "sum") for stage in STAGES},
+}
+
+# Metrics (same names as metrics.METRICS) derived from rolled-up measures;
+# averages are ratios of sums to counts so they roll up exactly.
+ROLLUP_METRICS = {
+    "Bookings_ACV": lambda c: c["Won_ACV_Sum"],
+    "Total_ACV": lambda c: c["ACV_Sum"],
+    "Win_Count": lambda c: c["Win_Count"],
+    "Total_Count": lambda c: c["Row_Count"],
+    "Win_Rate": lambda c: c["Win_Count"] / c["Row_Count"],
+    "Avg_Deal_Size": lambda c: c["Won_ACV_Sum"] / c["Won_ACV_Count"],
+    "Avg_Sales_Cycle": lambda c: c["Cycle_Sum"] / c["Cycle_Count"],
+    "Deal_Velocity": lambda c: c["Velocity_Sum"] / c["Velocity_Count"],
+    "Pipeline_Generated_ACV": lambda c: c["ACV_Sum"],
+    "Pipeline_Count": lambda c: c["ACV_Count"],
+    "Avg_Pipeline_Deal_Size": lambda c: c["ACV_Sum"] / c["ACV_Count"],
+    "Total_Pipeline_Generated": lambda c: c["Created_Count"],
+    "AE_Outbound_Pipeline_ACV": lambda c: c["AE_Outbound_ACV_Sum"],
+    "SDR_Outbound_Pipeline_ACV": lambda c: c["SDR_Outbound_ACV_Sum"],
+    "Marketing_Pipeline_ACV": lambda c: c["Marketing_ACV_Sum"],
+}
+
+
+def build_cube(df):
+    """Aggregate the additive MEASURES at the finest grain of CUBE_DIMENSIONS.
+
+    Missing dimension values are kept as their own cells so every opportunity
+    is counted once. Quarter dimensions are stored as strings ("2024Q1").
+    """
+    frame = widen(df)
+    frame = frame.assign(
+        **{"Has ACV": frame[ACV_COLUMN].notna()},
+        **{col: values(frame) for col, values in VALUE_COLUMNS.items()},
+        **stage_matrix(frame),
+    )
+    cube = frame.groupby(CUBE_DIMENSIONS, dropna=False, observed=True).agg(
+        **{name: pd.NamedAgg(column=col, aggfunc=func) for name, (col, func) in MEASURES.items()}
+    ).reset_index()
+    for col in QUARTER_DIMENSIONS:
+        cube[col] = cube[col].astype(str).where(cube[col].notna())
+    return cube
+
+
+def merge_cubes(parts):
+    """Fold cubes built over disjoint sets of rows into one; every measure is additive."""
+    cube = pd.concat(parts, ignore_index=True)
+    return cube.groupby(CUBE_DIMENSIONS, dropna=False, observed=True)[list(MEASURES)].sum().reset_index()
+
+
+def subtract_cube(cube, part):
+    """Remove the rows ``part`` was built from; cells left without rows are dropped."""
+    merged = merge_cubes([cube, part.assign(**{name: -part[name] for name in MEASURES})])
+    return merged[merged["Row_Count"] > 0].reset_index(drop=True)
+
+
+# Built chunk by chunk while a new snapshot is ingested and updated from the
+# changed rows on a delta refresh, so get_cube starts warm.
+INGEST_AGGREGATES["cube"] = (build_cube, merge_cubes, subtract_cube)
+PRECOMPUTE["cube"] = build_cube
+
+
+def get_cube(df):
+    """Cube for a frame returned by ``load_data``, built once per dataset version."""
+    return per_version(df, "cube", build_cube)
+
+
+def _select(cube, selections=None, has_acv=None):
+    keep = np.ones(len(cube), dtype=bool)
+    for col, selected in (selections or {}).items():
+        if len(selected):
+            keep &= cube[col].isin(list(selected)).to_numpy()
+    if has_acv is not None:
+        keep &= (cube["Has ACV"] == has_acv).to_numpy()
+    return keep
+
+
+def rollup(cube, dims, metrics, selections=None, has_acv=None):
+    """Answer a breakdown from the cube instead of the opportunity rows.
+
+    ``selections`` is the same ``{column: selected values}`` mapping the
+    FilterIndex takes; ``has_acv=True`` mirrors the ACV slider at full range,
+    which drops opportunities without an ACV. ``metrics`` is a list of
+    ROLLUP_METRICS names or a mapping of output name to metric name.
+    """
+    totals = cube[_select(cube, selections, has_acv)].groupby(list(dims), observed=True)[list(MEASURES)].sum()
+    if not isinstance(metrics, dict):
+        metrics = {name: name for name in metrics}
+    return pd.DataFrame({out: ROLLUP_METRICS[name](totals) for out, name in metrics.items()}, index=totals.index)
+
+
+def grouped_metrics(df, dims, metrics, selections=None, acv_range=None, has_acv=None):
+    """``metrics`` per ``dims`` group over the selected opportunities of a ``load_data`` frame.
+
+    Runs in DuckDB when that backend is enabled. Otherwise the full ACV range
+    (``acv_range`` None) is rolled up from the cube and a narrower one, which
+    the cube can't answer, aggregated from the FilterIndex-selected rows.
+    Arguments are as for duckdb_backend.aggregate.
+    """
+    if duckdb_backend.ENABLED:
+        return duckdb_backend.aggregate(df, dims, metrics, selections, acv_range, has_acv)
+    if acv_range is None:
+        return rollup(get_cube(df), dims, metrics, selections, has_acv)
+    from filters import get_index  # filters imports this module
+
+    return aggregate(df[get_index(df).mask(selections, acv_range=acv_range)], dims, metrics)
+
+
+def stage_counts(cube, by=(), selections=None):
+    """Funnel stage counts per (Created Quarter, Close Quarter, *by) cell, for funnel.rollup.
+
+    Quarters are strings; missing keys are kept as their own cells.
+    """
+    keys = ["Created Quarter", "Close Quarter"] + list(by)
+    return cube[_select(cube, selections)].groupby(keys, dropna=False, observed=True)[list(STAGES)].sum()
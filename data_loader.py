@@ -1,35 +1,790 @@
+import contextvars
+import glob
+import hashlib
+import importlib
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+
+import numpy as np
 import pandas as pd
 
-def load_data():
-    df = pd.read_csv("data.csv")
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # snapshots are an optimisation; fall back to parsing the CSV every time
+    feather = None
+
+# Frames are shared between sessions, so derived frames must never write
+# through to them; copy-on-write also lets column selections stay views.
+pd.set_option("mode.copy_on_write", True)
+
+# A CSV export, a directory of exports or a glob such as "exports/*.csv".
+DATA_PATH = os.environ.get("DASHBOARD_DATA", "data.csv")
+SNAPSHOT_DIR = ".cache"
+# Bump whenever the cleaning below changes so stale snapshots are rebuilt.
+SNAPSHOT_VERSION = 10
+# Rows cleaned per chunk when building a snapshot; bounds ingestion memory.
+CHUNK_ROWS = int(os.environ.get("DASHBOARD_CHUNK_ROWS", 200_000))
+# Seconds between checks of the data file by the background refresher.
+REFRESH_SECONDS = float(os.environ.get("DASHBOARD_REFRESH_SECONDS", 5))
+# Worker processes ingesting the files of a multi-source DATA_PATH, and how
+# long a file may take before it is reported and left out.
+INGEST_WORKERS = int(os.environ.get("DASHBOARD_INGEST_WORKERS", 0)) or os.cpu_count() or 1
+SOURCE_TIMEOUT = float(os.environ.get("DASHBOARD_SOURCE_TIMEOUT", 300))
+
+
+DATE_COLUMNS = ["Created Date", "Close Date", "SQL Datestamp", "SAL Datestamp", "SQO Datestamp"]
+# Formats seen in CRM exports, most common first ("2/22/2024 11:15:00", "3/14/2024, 7:34 AM").
+DATE_FORMATS = ["%m/%d/%Y %H:%M:%S", "%m/%d/%Y, %I:%M %p", "%m/%d/%Y %H:%M", "%m/%d/%Y"]
+
+DEAL_SIZE_BINS = [0, 10000, 50000, 100000, 500000, float('inf')]
+DEAL_SIZE_LABELS = ["<10K", "10-50K", "50-100K", "100-500K", "500K+"]
+DEAL_SIZE_DTYPE = pd.CategoricalDtype(DEAL_SIZE_LABELS, ordered=True)
+# Snapshot-only column with each row's content hash, for delta refreshes.
+ROW_HASH = "_row_hash"
+# Modules that register INGEST_AGGREGATES (see _register_aggregates).
+AGGREGATE_MODULES = ["cube", "durations"]
+# Categorical naming the export each row came from; added on read, not stored.
+SOURCE_FILE = "Source File"
+
+# Low-cardinality text columns, stored as categoricals (also in the snapshot).
+CATEGORY_COLUMNS = [
+    "Opportunity Owner", "Segment", "Type", "Source", "Inbound Type",
+    "Current Stage (as of data pull)", "Funnel Stage Reached",
+]
+# Stored as float32; widen() them before summing.
+FLOAT32_COLUMNS = ["Base Annual Contract Value", "Won ACV", "Sales Cycle (Days)", "Deal Velocity (Days)"]
+# Period columns held as categoricals in memory only: Feather can't read back
+# categorical periods, so the snapshot keeps them as plain periods.
+QUARTER_COLUMNS = ["Created Quarter", "Close Quarter", "Reference Quarter"]
+
+# Derived columns, evaluated in order; each expression sees the columns defined before it.
+DERIVED_COLUMNS = [
+    ("Created Quarter", lambda df: df["Created Date"].dt.to_period("Q")),
+    ("Close Quarter", lambda df: df["Close Date"].dt.to_period("Q")),
+    ("Reference Quarter", lambda df: df["Created Quarter"].combine_first(df["Close Quarter"])),
+    ("Is_Won", lambda df: df["Current Stage (as of data pull)"] == "Closed Won"),
+    ("Sales Cycle (Days)", lambda df: (df["Close Date"] - df["Created Date"]).dt.days),
+    ("Deal Velocity (Days)", lambda df: df["Sales Cycle (Days)"].where(df["Is_Won"])),
+    ("Won ACV", lambda df: df["Base Annual Contract Value"].where(df["Is_Won"])),
+    ("Deal Size Band", lambda df: pd.cut(df["Base Annual Contract Value"], bins=DEAL_SIZE_BINS, labels=DEAL_SIZE_LABELS)),
+]
+
+
+def parse_dates(values, formats=DATE_FORMATS):
+    """Parse date strings by trying each explicit format in turn.
+
+    Exports repeat the same timestamps many times, so only the distinct strings
+    are parsed and the results are broadcast back with the factorized codes.
+    Strings matching none of ``formats`` get pandas' own inference.
+    """
+    codes, uniques = pd.factorize(values.astype("string").str.strip())
+    uniques = pd.Series(uniques, dtype="string")
+    parsed = pd.Series(pd.NaT, index=uniques.index, dtype="datetime64[ns]")
+    todo = ~uniques.str.fullmatch(r"[-\s]*")
+    for fmt in formats:
+        if not todo.any():
+            break
+        parsed[todo] = pd.to_datetime(uniques[todo], format=fmt, errors="coerce")
+        todo &= parsed.isna()
+    if todo.any():
+        parsed[todo] = pd.to_datetime(uniques[todo], format="mixed", errors="coerce")
+    # Missing values factorize to -1, which picks up the trailing NaT.
+    lookup = np.append(parsed.to_numpy(), np.datetime64("NaT", "ns"))
+    return pd.Series(lookup[codes], index=values.index, name=values.name)
+
+
+def add_derived_columns(df, derived=DERIVED_COLUMNS):
+    for name, expr in derived:
+        df[name] = expr(df)
+    return df
+
+
+def widen(frame):
+    """``frame`` with float32 storage columns as float64, for full-precision sums and means."""
+    return frame.astype({col: "float64" for col, dtype in frame.dtypes.items() if dtype == "float32"})
+
 
-    df["Base Annual Contract Value"] = (
+def _compact(df):
+    present = df.columns
+    df = df.astype({col: "category" for col in CATEGORY_COLUMNS if col in present})
+    return df.astype({col: "float32" for col in FLOAT32_COLUMNS if col in present})
+
+
+def _categorize_quarters(df):
+    return df.astype({col: "category" for col in QUARTER_COLUMNS if col in df.columns})
+
+
+def _with_source(df, path):
+    source = pd.Categorical.from_codes(np.zeros(len(df), dtype="int8"), [os.path.basename(path)])
+    return df.assign(**{SOURCE_FILE: source})
+
+
+def _clean(df):
+    df["Base Annual Contract Value"] = pd.to_numeric(
         df["Base Annual Contract Value"]
         .astype(str)
         .str.replace(r'[\$,]', '', regex=True)
-        .str.strip()
+        .str.strip(),
+        errors='coerce'
     )
-    df["Base Annual Contract Value"] = pd.to_numeric(df["Base Annual Contract Value"], errors='coerce')
 
-    for col in ["Created Date", "Close Date", "SQL Datestamp", "SAL Datestamp", "SQO Datestamp"]:
+    for col in DATE_COLUMNS:
         if col in df.columns:
-            df[col] = (
-                df[col]
-                .astype(str)
-                .str.strip()
-                .replace(r'^[-\s]*$', pd.NA, regex=True)
-                .pipe(pd.to_datetime, errors="coerce")
-            )
-
-    df["Created Quarter"] = df["Created Date"].dt.to_period("Q")
-    df["Close Quarter"] = df["Close Date"].dt.to_period("Q")
-    df["Is_Won"] = df["Current Stage (as of data pull)"] == "Closed Won"
-    df["Deal Velocity (Days)"] = df.apply(
-        lambda x: (x["Close Date"] - x["Created Date"]).days if x["Is_Won"] else None, axis=1
-    )
+            df[col] = parse_dates(df[col])
+
+    return _compact(add_derived_columns(df))
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _snapshot_paths(path):
+    name = os.path.splitext(os.path.basename(path))[0]
+    base = os.path.join(os.path.dirname(path), SNAPSHOT_DIR, name)
+    return base + ".feather", base + ".json"
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_atomic(path, write):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
 
-    bins = [0, 10000, 50000, 100000, 500000, float('inf')]
-    labels = ["<10K", "10-50K", "50-100K", "100-500K", "500K+"]
-    df["Deal Size Band"] = pd.cut(df["Base Annual Contract Value"], bins=bins, labels=labels)
+def snapshot_key(path, meta=None):
+    """Identify the source file by size, mtime and content hash.
 
+    The hash is only recomputed when size or mtime differ from the stored
+    snapshot metadata, so an unchanged file costs a single ``stat`` call.
+    """
+    stat = os.stat(path)
+    key = {"version": SNAPSHOT_VERSION, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if meta and all(meta.get(k) == v for k, v in key.items()):
+        key["sha256"] = meta["sha256"]
+    else:
+        key["sha256"] = _file_hash(path)
+    return key
+
+
+def _decode(table):
+    # Categoricals are stored as strings (see _ingest); decode straight to categories.
+    if ROW_HASH in table.column_names:
+        table = table.drop_columns([ROW_HASH])
+    columns = [col for col in CATEGORY_COLUMNS + ["Deal Size Band"] if col in table.column_names]
+    df = table.to_pandas(categories=columns)
+    for col in columns:
+        if col == "Deal Size Band":
+            df[col] = df[col].astype(DEAL_SIZE_DTYPE)
+        else:
+            # Same category order as astype("category") on the parsed CSV.
+            df[col] = df[col].cat.reorder_categories(sorted(df[col].cat.categories))
     return df
+
+
+def _read_snapshot(snap_path):
+    return _decode(feather.read_table(snap_path, memory_map=True))
+
+
+def _write_json(path, obj):
+    def write(tmp):
+        with open(tmp, "w") as f:
+            json.dump(obj, f)
+    _write_atomic(path, write)
+
+
+# name -> (build, merge, subtract): aggregates computed per chunk during
+# ingestion and folded with ``merge([total, part])``. On a delta refresh the
+# stored total is updated with ``merge`` for inserted rows and
+# ``subtract(total, part)`` for removed ones. Results are stored next to the
+# snapshot and seed per_version(df, name, ...).
+INGEST_AGGREGATES = {}
+
+
+def _aggregate_path(path, name):
+    return os.path.splitext(_snapshot_paths(path)[0])[0] + f".{name}.feather"
+
+
+def _read_aggregates(path):
+    aggregates = {}
+    for name in INGEST_AGGREGATES:
+        try:
+            aggregates[name] = feather.read_feather(_aggregate_path(path, name))
+        except (OSError, pa.ArrowInvalid):
+            pass
+    return aggregates
+
+
+def _row_hashes(raw):
+    """64-bit content hash of each raw CSV row; identical rows hash alike."""
+    return pd.util.hash_pandas_object(raw, index=False).to_numpy()
+
+
+def _surplus(hashes, other):
+    """Positions in ``hashes`` of rows without a counterpart in ``other``, as multisets."""
+    rank = pd.Series(hashes).groupby(hashes).cumcount().to_numpy()
+    uniques, counts = np.unique(other, return_counts=True)
+    if not len(uniques):
+        return np.arange(len(hashes))
+    pos = np.minimum(np.searchsorted(uniques, hashes), len(uniques) - 1)
+    have = np.where(uniques[pos] == hashes, counts[pos], 0)
+    return np.flatnonzero(rank >= have)
+
+
+def _text_columns(columns):
+    """The raw CSV ``columns`` cleaning leaves as text: all but the dates, the ACV and derived columns."""
+    typed = set(DATE_COLUMNS) | {"Base Annual Contract Value"} | {name for name, _ in DERIVED_COLUMNS}
+    return [col for col in columns if col not in typed]
+
+
+def _to_arrow(chunk, schema=None, text_columns=()):
+    chunk = chunk.astype({col: object for col, dtype in chunk.dtypes.items() if dtype == "category"})
+    if schema is None:
+        # Text columns are typed from the header, not inferred: one blank in
+        # the first chunk would be typed null and reject later chunks' values.
+        schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+        for col in CATEGORY_COLUMNS + ["Deal Size Band"] + list(text_columns):
+            if col in schema.names:
+                i = schema.get_field_index(col)
+                schema = schema.set(i, schema.field(i).with_type(pa.string()))
+    return pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+
+
+def _ingest(path, snap_path, chunk_rows=CHUNK_ROWS, previous=None):
+    """Clean the CSV ``chunk_rows`` rows at a time into the Feather store at ``snap_path``.
+
+    Only one chunk is held in memory, so peak memory follows ``chunk_rows``
+    rather than the file size. Each chunk has its own categories, so
+    categoricals are written as strings. Returns the INGEST_AGGREGATES
+    folded over all chunks.
+
+    ``previous`` is the last snapshot table and its stored aggregates. There
+    is no opportunity ID, so rows are matched by content hash: an edited row
+    is a removal plus an insertion. Rows found in ``previous`` are copied
+    rather than re-cleaned, and the aggregates are updated from the inserted
+    and removed rows only.
+    """
+    folded = {}
+    hashes = []
+    if previous is not None:
+        old_table, old_aggregates = previous
+        old_hashes = old_table[ROW_HASH].to_numpy()
+        old_order = np.argsort(old_hashes, kind="stable")
+        old_sorted = old_hashes[old_order]
+
+    def write(tmp):
+        writer = schema = None
+        try:
+            with pd.read_csv(path, dtype=str, chunksize=chunk_rows) as reader:
+                for raw in reader:
+                    row_hashes = _row_hashes(raw)
+                    hashes.append(row_hashes)
+                    if previous is None:
+                        chunk = _clean(raw).assign(**{ROW_HASH: row_hashes})
+                        for name, (build, merge, _) in INGEST_AGGREGATES.items():
+                            part = build(_with_source(chunk, path))
+                            folded[name] = part if name not in folded else merge([folded[name], part])
+                        table = _to_arrow(chunk, schema, _text_columns(raw.columns))
+                    else:
+                        pos = np.minimum(np.searchsorted(old_sorted, row_hashes), len(old_sorted) - 1)
+                        known = old_sorted[pos] == row_hashes
+                        parts = [old_table.take(old_order[pos[known]])]
+                        if not known.all():
+                            fresh = _clean(raw[~known]).assign(**{ROW_HASH: row_hashes[~known]})
+                            parts.append(_to_arrow(fresh, old_table.schema))
+                        # Put copied and freshly cleaned rows back in file order.
+                        rows = np.concatenate([np.flatnonzero(known), np.flatnonzero(~known)])
+                        table = pa.concat_tables(parts).take(np.argsort(rows))
+                    if writer is None:
+                        schema = table.schema
+                        # Uncompressed so later loads can memory-map the file directly.
+                        writer = pa.ipc.new_file(tmp, schema)
+                    writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+
+        if previous is not None:
+            new_hashes = np.concatenate(hashes) if hashes else np.array([], dtype="uint64")
+            inserted = _with_source(_decode(feather.read_table(tmp, memory_map=True).take(_surplus(new_hashes, old_hashes))), path)
+            removed = _with_source(_decode(old_table.take(_surplus(old_hashes, new_hashes))), path)
+            for name, (build, merge, subtract) in INGEST_AGGREGATES.items():
+                total = old_aggregates[name]
+                if len(inserted):
+                    total = merge([total, build(inserted)])
+                if len(removed):
+                    total = subtract(total, build(removed))
+                folded[name] = total
+
+    os.makedirs(os.path.dirname(snap_path), exist_ok=True)
+    _write_atomic(snap_path, write)
+    return folded
+
+
+def _previous_state(path, meta):
+    """Last snapshot and aggregates, if a delta refresh can start from them."""
+    snap_path = _snapshot_paths(path)[0]
+    if not (meta and meta.get("version") == SNAPSHOT_VERSION and os.path.exists(snap_path)):
+        return None
+    aggregates = _read_aggregates(path)
+    if set(aggregates) != set(INGEST_AGGREGATES):
+        return None
+    table = feather.read_table(snap_path, memory_map=True)
+    if not table.num_rows:
+        return None
+    header = list(pd.read_csv(path, nrows=0).columns)
+    if table.column_names != header + [name for name, _ in DERIVED_COLUMNS] + [ROW_HASH]:
+        return None
+    return table, aggregates
+
+
+def source_files(path):
+    """The CSV exports ``path`` names: the file itself, a directory's ``*.csv`` files or a glob's matches."""
+    if os.path.isdir(path):
+        return sorted(glob.glob(os.path.join(path, "*.csv")))
+    if glob.has_magic(path):
+        return sorted(glob.glob(path))
+    return [path]
+
+
+def read_data(path=DATA_PATH, chunk_rows=CHUNK_ROWS):
+    """Read a fresh cleaned frame from the snapshot, re-ingesting the CSV if it is stale.
+
+    ``path`` may also name several exports (see source_files); they are
+    combined as in _read_sources. Every call returns a new frame; pages
+    should use ``load_data`` instead.
+    """
+    files = source_files(path)
+    if files == [path]:
+        df, folded = _read_file(path, chunk_rows)
+    else:
+        df, folded = _read_sources(files, chunk_rows)
+    for name, result in folded.items():
+        _remember(name, df.attrs["version"], result)
+    return df
+
+
+def _read_file(path, chunk_rows=CHUNK_ROWS):
+    """Frame and ingest aggregates for one export, from its snapshot when that is current."""
+    _register_aggregates()
+    if feather is None:
+        df = _with_source(_categorize_quarters(_clean(pd.read_csv(path, dtype=str))), path)
+        df.attrs["version"] = snapshot_key(path)["sha256"][:12]
+        return df, {}
+
+    snap_path, meta_path = _snapshot_paths(path)
+    meta = _read_meta(meta_path)
+    key = snapshot_key(path, meta)
+
+    if meta and meta.get("version") == key["version"] and meta.get("sha256") == key["sha256"] and os.path.exists(snap_path):
+        if meta != key:
+            # File was touched/copied without changing content; refresh the cheap fields.
+            try:
+                _write_json(meta_path, key)
+            except OSError:
+                pass
+        df = _read_snapshot(snap_path)
+        folded = _read_aggregates(path)
+    else:
+        try:
+            previous = _previous_state(path, meta)
+            # Snapshot, aggregates and metadata disagree until the new metadata is written.
+            if os.path.exists(meta_path):
+                os.remove(meta_path)
+            for stale in glob.glob(_aggregate_path(path, "*")):
+                os.remove(stale)
+            folded = _ingest(path, snap_path, chunk_rows, previous)
+            for name, aggregate in folded.items():
+                _write_atomic(_aggregate_path(path, name), lambda tmp: feather.write_feather(aggregate, tmp))
+            _write_json(meta_path, key)
+            df = _read_snapshot(snap_path)
+        except OSError:
+            # Read-only checkout: parse in memory and keep serving the frame.
+            folded = {}
+            df = _clean(pd.read_csv(path, dtype=str))
+            snap_path = None
+
+    df = _with_source(_categorize_quarters(df), path)
+    df.attrs["version"] = key["sha256"][:12]
+    if snap_path:
+        df.attrs["snapshot"] = snap_path  # for backends that scan the file directly
+    return df, folded
+
+
+def _register_aggregates():
+    # Every entry point must persist the same aggregates: a snapshot refreshed
+    # without one would delete its file and turn later delta refreshes into
+    # full rebuilds. Imported here rather than at the top to avoid a cycle.
+    for module in AGGREGATE_MODULES:
+        importlib.import_module(module)
+
+
+def _ingest_source(path, chunk_rows):
+    # Worker entry point: only the snapshot is wanted, not the frame sent back.
+    _read_file(path, chunk_rows)
+
+
+def _ingest_parallel(files, chunk_rows):
+    """Bring every file's snapshot up to date in a pool of worker processes.
+
+    Returns ``{path: error}`` for files that failed or were still running
+    after SOURCE_TIMEOUT; those are left out rather than waited for.
+    """
+    # Spawned, not forked: this runs on server and refresher threads, and a
+    # forked child could inherit a lock another thread was holding.
+    pool = ProcessPoolExecutor(max_workers=min(INGEST_WORKERS, len(files)), mp_context=multiprocessing.get_context("spawn"))
+    try:
+        futures = {pool.submit(_ingest_source, path, chunk_rows): path for path in files}
+        done, pending = wait(futures, timeout=SOURCE_TIMEOUT)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    errors = {futures[future]: f"timed out after {SOURCE_TIMEOUT:g} s" for future in pending}
+    for future in done:
+        error = future.exception()
+        # A crashed pool fails every file; those are retried in this process.
+        if error is not None and not isinstance(error, BrokenProcessPool):
+            errors[futures[future]] = f"{type(error).__name__}: {error}"
+    return errors
+
+
+def _union_categories(frames):
+    """``frames`` with each unordered categorical column recoded to the union of its categories."""
+    for col, dtype in frames[0].dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype) and not dtype.ordered:
+            categories = frames[0][col].cat.categories
+            for frame in frames[1:]:
+                categories = categories.union(frame[col].cat.categories)
+            frames = [frame.assign(**{col: frame[col].cat.set_categories(categories)}) for frame in frames]
+    return frames
+
+
+def _concat(frames):
+    """Concatenate cleaned frames, keeping categorical columns categorical."""
+    if len(frames) == 1:
+        return frames[0].copy(deep=False)
+    return pd.concat(_union_categories(frames), ignore_index=True)
+
+
+def _read_sources(files, chunk_rows=CHUNK_ROWS):
+    """One frame and set of aggregates over several exports, with a SOURCE_FILE column.
+
+    Snapshots are brought up to date in parallel worker processes (see
+    _ingest_parallel), then memory-mapped here and concatenated; each
+    file's ingest aggregates are merged. Files that fail or time out are
+    left out and listed in ``df.attrs["source_errors"]``.
+    """
+    if not files:
+        raise FileNotFoundError("no CSV files match the data path")
+    errors = _ingest_parallel(files, chunk_rows) if feather is not None and len(files) > 1 else {}
+    frames, aggregates, versions = [], [], []
+    for path in files:
+        if path in errors:
+            continue
+        try:
+            df, folded = _read_file(path, chunk_rows)
+        except Exception as e:
+            errors[path] = f"{type(e).__name__}: {e}"
+            continue
+        frames.append(df)
+        aggregates.append(folded)
+        versions.append(f"{path}:{df.attrs.get('version')}")
+    if not frames:
+        raise ValueError("no source file could be read: " + "; ".join(f"{p}: {e}" for p, e in errors.items()))
+
+    df = _concat(frames)
+    df.attrs = {
+        "version": hashlib.sha256(" ".join(versions).encode()).hexdigest()[:12],
+        "source_errors": errors,
+    }
+    folded = {
+        name: merge(_union_categories([parts[name] for parts in aggregates]))
+        for name, (_, merge, _) in INGEST_AGGREGATES.items()
+        if all(name in parts for parts in aggregates)
+    }
+    return df, folded
+
+
+# abspath -> the Loaded dataset currently served for it.
+_SHARED = {}
+_SHARED_LOCK = threading.Lock()
+Loaded = namedtuple("Loaded", "stamp df")
+_pinned = contextvars.ContextVar("pinned_data", default=None)
+
+
+def _stamp(path):
+    stamp = []
+    for source in source_files(path):
+        stat = os.stat(source)
+        stamp.append((source, stat.st_size, stat.st_mtime_ns))
+    return tuple(stamp)
+
+
+def _swap(key, stamp, df):
+    """Serve ``df`` for ``key``; keep the frame in hand if its content is unchanged. Hold _SHARED_LOCK."""
+    cached = _SHARED.get(key)
+    if cached is not None and cached.df.attrs["version"] == df.attrs["version"]:
+        df = cached.df
+    else:
+        df.attrs["built_at"] = time.time()
+    _SHARED[key] = Loaded(stamp, df)
+    return _SHARED[key]
+
+
+@contextmanager
+def pinned():
+    """Return the same frame from every ``load_data(path)`` call in the block.
+
+    app.py wraps each rerun in it, so a refresh swapped in mid-rerun is only
+    seen by the next one.
+    """
+    token = _pinned.set({})
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+def load_data(path=DATA_PATH):
+    """Cleaned opportunities for ``path``, held once per process and shared by all sessions.
+
+    The file is re-read only when its size or mtime changes, and the frame
+    in hand is kept if the content hash turns out unchanged. Once
+    ``start_refresh(path)`` has been called, changes are picked up by the
+    background refresher instead and this never blocks after the first load.
+    Treat the result as read-only: derive new frames from it rather than
+    assigning into it.
+    """
+    key = os.path.abspath(path)
+    pins = _pinned.get()
+    if pins is not None and key in pins:
+        return pins[key]
+    with _SHARED_LOCK:
+        cached = _SHARED.get(key)
+        if cached is None or (key not in _REFRESHERS and cached.stamp != _stamp(path)):
+            stamp = _stamp(path)
+            cached = _swap(key, stamp, read_data(path))
+    if pins is not None:
+        pins[key] = cached.df
+    return cached.df
+
+
+# name -> build(df): per-version structures (indexes, cubes) the refresher
+# builds for a new version before swapping it in; modules register their own.
+PRECOMPUTE = {}
+_REFRESHERS = {}
+
+
+class Refresher(threading.Thread):
+    """Daemon thread that rebuilds a changed data file off the request path and swaps it in.
+
+    A change is acted on once the file's size and mtime have held for one
+    poll, so a half-written export is never read; if the file changes again
+    while building, the result is dropped and the next stable state is built.
+    """
+
+    def __init__(self, path, interval):
+        super().__init__(name=f"refresh {path}", daemon=True)
+        self.path = path
+        self.key = os.path.abspath(path)
+        self.interval = interval
+        self.building = False
+        self.error = None
+        self._failed = None
+
+    def run(self):
+        seen = None
+        while True:
+            time.sleep(self.interval)
+            try:
+                stamp = _stamp(self.path)
+            except OSError as e:
+                self.error, seen = f"{type(e).__name__}: {e}", None
+                continue
+            if stamp == _SHARED[self.key].stamp or stamp == self._failed:
+                seen = None
+            elif stamp != seen:
+                seen = stamp  # first sighting or still being written; wait for it to settle
+            else:
+                self.refresh(stamp)
+                seen = None
+
+    def refresh(self, stamp):
+        self.building = True
+        try:
+            df = read_data(self.path)
+            for name, build in list(PRECOMPUTE.items()):
+                per_version(df, name, build)
+            if _stamp(self.path) != stamp:
+                return
+            with _SHARED_LOCK:
+                _swap(self.key, stamp, df)
+            self.error = self._failed = None
+        except Exception as e:
+            # Keep serving the current version; retry once the file changes again.
+            self.error, self._failed = f"{type(e).__name__}: {e}", stamp
+        finally:
+            self.building = False
+
+
+def start_refresh(path=DATA_PATH, interval=REFRESH_SECONDS):
+    """Load ``path`` and keep it fresh from a background thread; idempotent.
+
+    A non-positive ``interval`` leaves load_data reloading in the request path.
+    """
+    load_data(path)
+    key = os.path.abspath(path)
+    with _SHARED_LOCK:
+        if interval > 0 and key not in _REFRESHERS:
+            _REFRESHERS[key] = Refresher(path, interval)
+            _REFRESHERS[key].start()
+
+
+def data_status(path=DATA_PATH):
+    """Version, build time and refresher state of the dataset ``load_data(path)`` serves."""
+    df = load_data(path)
+    refresher = _REFRESHERS.get(os.path.abspath(path))
+    return {
+        "version": df.attrs["version"],
+        "built_at": df.attrs["built_at"],
+        "rows": len(df),
+        "refreshing": bool(refresher and refresher.building),
+        "error": refresher.error if refresher else None,
+        "source_errors": df.attrs.get("source_errors", {}),
+    }
+
+
+# name -> {version: result}, holding the last VERSIONS_KEPT versions so
+# sessions still on the previous version don't rebuild while a new one is
+# prepared or swapped in.
+_VERSIONED = {}
+_VERSIONED_LOCK = threading.Lock()
+VERSIONS_KEPT = 2
+
+
+def _remember(name, version, result):
+    with _VERSIONED_LOCK:
+        versions = _VERSIONED.setdefault(name, OrderedDict())
+        versions[version] = result
+        versions.move_to_end(version)
+        while len(versions) > VERSIONS_KEPT:
+            versions.popitem(last=False)
+
+
+def per_version(df, name, build):
+    """Return ``build(df)``, computed once per dataset version.
+
+    Results are keyed by ``name`` and ``df.attrs["version"]``; only the
+    latest VERSIONS_KEPT versions are kept. Frames without a version are not
+    cached. Only pass frames as returned by ``load_data``.
+    """
+    version = df.attrs.get("version")
+    if version is None:
+        return build(df)
+    with _VERSIONED_LOCK:
+        versions = _VERSIONED.get(name, {})
+        if version in versions:
+            return versions[version]
+    result = build(df)
+    _remember(name, version, result)
+    return result
+
+
+def _best_of(fn, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def _check_chunked(path=DATA_PATH, chunk_rows=500):
+    """Ingest a copy of ``path`` in ``chunk_rows``-row chunks and compare it with cleaning it whole.
+
+    The copy gets an extra text column left blank for the first two chunks,
+    so the snapshot's column types can't depend on what the first chunk holds.
+    """
+    import tempfile
+
+    raw = pd.read_csv(path, dtype=str)
+    raw["Opportunity Notes"] = np.where(np.arange(len(raw)) >= 2 * chunk_rows, "note", None)
+    with tempfile.TemporaryDirectory() as tmp:
+        copy = os.path.join(tmp, os.path.basename(path))
+        raw.to_csv(copy, index=False)
+        chunked = _read_file(copy, chunk_rows)[0]
+        whole = _with_source(_categorize_quarters(_clean(pd.read_csv(copy, dtype=str))), copy)
+    plain = lambda frame: frame.astype(object).where(frame.notna(), None)
+    pd.testing.assert_frame_equal(plain(chunked), plain(whole))
+
+
+def _report(path=DATA_PATH, runs=5):
+    snap_path, meta_path = _snapshot_paths(path)
+    for p in (snap_path, meta_path):
+        if os.path.exists(p):
+            os.remove(p)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    df = read_data(path)
+    cold = time.perf_counter() - start
+    ingest_peak = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    warm = _best_of(lambda: read_data(path), runs)
+    load_data(path)
+    shared = _best_of(lambda: load_data(path), runs)
+    # What one more session holds once the shared frame is loaded.
+    tracemalloc.start()
+    session = load_data(path)
+    session_mb = tracemalloc.get_traced_memory()[0] / 2**20
+    tracemalloc.stop()
+    del session
+
+    # Layout before compaction: object strings, float64 values, int64 periods.
+    loose = df.astype({
+        **{col: object for col in CATEGORY_COLUMNS if col in df.columns},
+        **{col: "float64" for col in FLOAT32_COLUMNS if col in df.columns},
+        **{col: df[col].cat.categories.dtype for col in QUARTER_COLUMNS if col in df.columns},
+    })
+    loose_mb = loose.memory_usage(deep=True).sum() / 2**20
+    compact_mb = df.memory_usage(deep=True).sum() / 2**20
+
+    print(f"{path}: {len(df):,} rows")
+    print(f"cold load (parse + snapshot): {cold * 1000:8.1f} ms  (peak {ingest_peak:.1f} MB, {CHUNK_ROWS:,}-row chunks)")
+    print(f"warm load (memory-mapped):    {warm * 1000:8.1f} ms  (best of {runs})")
+    print(f"shared load (in process):     {shared * 1000:8.1f} ms  (best of {runs})")
+    print(f"speedup:                      {cold / warm:8.1f}x")
+    print(f"frame memory:                 {loose_mb:8.2f} MB loose -> {compact_mb:8.2f} MB compact")
+    print(f"per-session frame memory:     {loose_mb:8.2f} MB before -> {session_mb:8.2f} MB shared (one {compact_mb:.2f} MB copy per process)")
+    _check_chunked(path)
+    print("chunked ingest:               matches a whole-file read (500-row chunks, sparse text column)")
+
+
+if __name__ == "__main__":
+    import data_loader  # the module the aggregates registered with, not __main__
+
+    data_loader._report(*sys.argv[1:2])
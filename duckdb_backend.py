@@ -0,0 +1,227 @@
+"""Optional DuckDB query backend for the grouped page metrics.
+
+With DASHBOARD_BACKEND=duckdb, pages compile their filters and breakdowns to
+SQL that runs in an in-process DuckDB over a database file built from the
+Feather snapshot; filters, the ACV range and the won/source-conditional sums are evaluated in
+DuckDB's scans and only the aggregated rows come back as a DataFrame. The
+pandas path stays the default and is the reference: running
+
+    python duckdb_backend.py [data.csv]
+
+computes every spec in CHECK_SPECS both ways and reports any difference.
+Requires ``pip install duckdb``.
+"""
+import os
+import sys
+import threading
+
+import pandas as pd
+
+from data_loader import DEAL_SIZE_LABELS, PRECOMPUTE, QUARTER_COLUMNS, ROW_HASH, SOURCE_FILE, _write_atomic, per_version
+
+ENABLED = os.environ.get("DASHBOARD_BACKEND") == "duckdb"
+
+ACV = '"Base Annual Contract Value"'
+
+# Metric name (as in metrics.METRICS) -> SQL aggregate. Sums of no values are
+# 0, as in pandas; means of no values are NULL, i.e. NaN.
+SQL_METRICS = {
+    "Bookings_ACV": 'coalesce(sum("Won ACV"), 0)',
+    "Total_ACV": f"coalesce(sum({ACV}), 0)",
+    "Win_Count": 'count_if("Is_Won")',
+    "Total_Count": 'count("Is_Won")',
+    "Win_Rate": 'avg("Is_Won"::INTEGER)',
+    "Avg_Deal_Size": 'avg("Won ACV")',
+    "Avg_Sales_Cycle": 'avg("Sales Cycle (Days)")',
+    "Deal_Velocity": 'avg("Deal Velocity (Days)")',
+    "Total_Pipeline_Generated": 'count("Created Date")',
+    "Pipeline_Generated_ACV": f"coalesce(sum({ACV}), 0)",
+    "Pipeline_Count": f"count({ACV})",
+    "Avg_Pipeline_Deal_Size": f"avg({ACV})",
+    "AE_Outbound_Pipeline_ACV": f"coalesce(sum({ACV}) FILTER (WHERE \"Source\" = 'AE Outbound'), 0)",
+    "SDR_Outbound_Pipeline_ACV": f"coalesce(sum({ACV}) FILTER (WHERE \"Source\" = 'SDR Outbound'), 0)",
+    "Marketing_Pipeline_ACV": f"coalesce(sum({ACV}) FILTER (WHERE \"Source\" LIKE '%Marketing%'), 0)",
+}
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _source_table(df):
+    """Arrow table of ``df``'s rows, read from its snapshot when it has one.
+
+    Quarter columns are added as "2024Q1" strings: DuckDB can't read the
+    snapshot's Period columns. The source file column isn't stored in
+    snapshots and is added from the frame.
+    """
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    if "snapshot" in df.attrs:
+        table = feather.read_table(df.attrs["snapshot"], memory_map=True)
+    else:
+        table = pa.Table.from_pandas(df.drop(columns=QUARTER_COLUMNS), preserve_index=False)
+    table = table.drop_columns([col for col in QUARTER_COLUMNS + [ROW_HASH] if col in table.column_names])
+    for col in QUARTER_COLUMNS:
+        table = table.append_column(col, pa.array(df[col].cat.rename_categories(str)))
+    if SOURCE_FILE not in table.column_names:
+        table = table.append_column(SOURCE_FILE, pa.array(df[SOURCE_FILE].astype(str)))
+    return table
+
+
+def _database_version(db_path):
+    import duckdb
+
+    try:
+        with duckdb.connect(db_path, read_only=True) as con:
+            return con.execute("SELECT version FROM dataset").fetchone()[0]
+    except (duckdb.Error, TypeError):
+        return None
+
+
+def _build_database(db_path, df):
+    import duckdb
+
+    with duckdb.connect(db_path) as con:
+        con.register("source", _source_table(df))
+        con.execute("CREATE TABLE opportunities AS SELECT * FROM source")
+        con.execute("CREATE TABLE dataset AS SELECT ? AS version", [df.attrs["version"]])
+
+
+class Connection:
+    """Read-only DuckDB connection to one dataset version's ``opportunities`` table.
+
+    Frames loaded from a snapshot get a database file next to it, built once
+    per version and then opened read-only by every process, so queries run
+    out of DuckDB's buffer pool rather than a second in-memory copy. Other
+    frames are loaded into an in-memory database.
+    """
+
+    def __init__(self, df):
+        import duckdb  # deferred: only needed when the backend is enabled
+
+        if "snapshot" in df.attrs:
+            db_path = os.path.splitext(df.attrs["snapshot"])[0] + ".duckdb"
+            if _database_version(db_path) != df.attrs["version"]:
+                _write_atomic(db_path, lambda tmp: _build_database(tmp, df))
+            self._con = duckdb.connect(db_path, read_only=True)
+        else:
+            self._con = duckdb.connect()
+            self._con.register("source", _source_table(df))
+            self._con.execute("CREATE TABLE opportunities AS SELECT * FROM source")
+        # One connection per version, shared by sessions; DuckDB parallelises each query itself.
+        self._lock = threading.Lock()
+
+    def query(self, sql, params=()):
+        with self._lock:
+            return self._con.execute(sql, list(params)).df()
+
+
+def get_connection(df):
+    """Connection for a frame returned by ``load_data``, opened once per dataset version."""
+    return per_version(df, "duckdb", Connection)
+
+
+if ENABLED:
+    PRECOMPUTE["duckdb"] = Connection
+
+
+def compile_query(dims, metrics, selections=None, acv_range=None, has_acv=None):
+    """SQL and parameters for ``aggregate``; see there for the arguments."""
+    if not isinstance(metrics, dict):
+        metrics = {name: name for name in metrics}
+    where, params = [], []
+    for col, selected in (selections or {}).items():
+        if len(selected):
+            where.append(f"{_quote(col)} IN ({', '.join('?' * len(selected))})")
+            params.extend(str(value) for value in selected)
+    if acv_range is not None:
+        where.append(f"CAST({ACV} AS DOUBLE) BETWEEN ? AND ?")
+        params.extend(float(bound) for bound in acv_range)
+    if has_acv is not None:
+        where.append(f"{ACV} IS {'NOT ' if has_acv else ''}NULL")
+    # pandas groupby drops missing keys
+    where.extend(f"{_quote(dim)} IS NOT NULL" for dim in dims)
+
+    keys = ", ".join(_quote(dim) for dim in dims)
+    order = ", ".join(
+        f"list_position({DEAL_SIZE_LABELS!r}, {_quote(dim)})" if dim == "Deal Size Band" else _quote(dim)
+        for dim in dims
+    )
+    select = ", ".join([keys] + [f"{SQL_METRICS[name]} AS {_quote(out)}" for out, name in metrics.items()])
+    sql = f"SELECT {select} FROM opportunities"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    return sql + f" GROUP BY {keys} ORDER BY {order}", params
+
+
+def aggregate(df, dims, metrics, selections=None, acv_range=None, has_acv=None):
+    """``metrics`` per ``dims`` group over the rows FilterIndex.mask would select.
+
+    ``selections`` and ``acv_range`` are as for FilterIndex.mask; ``has_acv``
+    as for cube.rollup. ``metrics`` is a list of SQL_METRICS names or a
+    mapping of output name to metric name. Returns a frame indexed by ``dims``
+    like metrics.aggregate, with plain string keys.
+    """
+    sql, params = compile_query(dims, metrics, selections, acv_range, has_acv)
+    return get_connection(df).query(sql, params).set_index(list(dims))
+
+
+# (page module, compute spec) pairs for the equivalence check.
+CHECK_SPECS = [
+    ("revenue_metrics", {}),
+    ("revenue_metrics", {"filters": {"Segment": ["Enterprise"]}, "dims": ["Close Quarter", "Segment"]}),
+    ("revenue_metrics", {"filters": {"Source": ["AE Outbound", "SDR Outbound"]}, "acv_range": (10_000, 200_000),
+                         "dims": ["Deal Size Band", "Opportunity Owner", "Type"]}),
+    ("revenue_metrics", {"filters": {"Close Quarter": ["2024Q3", "2024Q4"]}, "dims": ["Created Quarter", "Inbound Type"]}),
+    ("pipegen_metrics", {}),
+    ("pipegen_metrics", {"dims": ["Source", "Deal Size Band"]}),
+    ("pipegen_metrics", {"filters": {"Segment": ["Mid-Market"]}, "acv_range": (0, 50_000), "dims": ["Opportunity Owner"]}),
+    ("rep_scorecards", {}),
+    ("rep_scorecards", {"filters": {"Segment": ["Enterprise"], "Source": ["AE Outbound"]}}),
+    ("rep_scorecards", {"bookings_quarters": ["2024Q1", "2024Q2"], "pipeline_quarters": ["2024Q1"]}),
+]
+
+
+def _plain(frame):
+    frame = frame.reset_index(drop=True)
+    return frame.astype({col: str for col, dtype in frame.dtypes.items() if dtype == "category" or dtype == object})
+
+
+def check(path):
+    """Compare every CHECK_SPECS result between the pandas and DuckDB paths; return the failures."""
+    global ENABLED
+    import importlib
+
+    from data_loader import load_data
+
+    df = load_data(path)
+    failures = 0
+    for module, spec in CHECK_SPECS:
+        mismatched = 0
+        compute = importlib.import_module(f"pages.{module}").compute
+        enabled = ENABLED
+        try:
+            ENABLED = False
+            expected = compute(df, spec)
+            ENABLED = True
+            actual = compute(df, spec)
+        finally:
+            ENABLED = enabled
+        for key, frame in expected.items():
+            try:
+                pd.testing.assert_frame_equal(_plain(frame), _plain(actual[key]), check_dtype=False, rtol=1e-6)
+            except AssertionError as e:
+                mismatched += 1
+                print(f"MISMATCH {module} {spec} [{key}]\n{e}\n")
+        print(f"{module:<16} {'ok' if not mismatched else 'FAILED'}  {spec}")
+        failures += mismatched
+    return failures
+
+
+if __name__ == "__main__":
+    import duckdb_backend  # the module the pages see, not __main__
+    from data_loader import DATA_PATH
+
+    sys.exit(1 if duckdb_backend.check(sys.argv[1] if len(sys.argv) > 1 else DATA_PATH) else 0)
@@ -0,0 +1,135 @@
+"""Stage-to-stage durations as mergeable quantile sketches.
+
+Each duration (Created→SQL, …, Created→Close) is bucketed on a logarithmic
+scale, as in DDSketch: bucket ``i`` holds values in (γ^(i-1), γ^i] with
+γ = (1 + α) / (1 - α), so any quantile read back from the counts is within
+RELATIVE_ACCURACY of the exact one. The sketch store is a cube of bucket
+counts per DURATION_DIMENSIONS cell; counts add, so sketches are merged by
+summing, built chunk by chunk at ingestion and updated from changed rows.
+"""
+import numpy as np
+import pandas as pd
+
+from data_loader import INGEST_AGGREGATES, PRECOMPUTE, per_version
+
+# Duration name -> (start date column, end date column)
+DURATIONS = {
+    "Created→SQL": ("Created Date", "SQL Datestamp"),
+    "SQL→SAL": ("SQL Datestamp", "SAL Datestamp"),
+    "SAL→SQO": ("SAL Datestamp", "SQO Datestamp"),
+    "SQO→Close": ("SQO Datestamp", "Close Date"),
+    "Created→Close": ("Created Date", "Close Date"),
+}
+# Close Date is only a forecast until an opportunity closes, so durations
+# ending at it count closed opportunities only (as Deal Velocity counts won ones).
+CLOSE_DATE = "Close Date"
+CLOSED_STAGES = ["Closed Won", "Closed Lost"]
+DURATION_DIMENSIONS = [
+    "Created Quarter", "Close Quarter", "Opportunity Owner", "Segment",
+    "Type", "Source", "Inbound Type", "Deal Size Band", "Source File",
+]
+QUARTER_DIMENSIONS = ["Created Quarter", "Close Quarter"]
+RELATIVE_ACCURACY = 0.02
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+# Durations below MIN_DAYS (same-minute transitions, and negative ones from
+# out-of-order timestamps) share ZERO_BUCKET and read back as 0.
+MIN_DAYS = 1 / 1440
+ZERO_BUCKET = np.iinfo(np.int16).min
+
+
+def stage_durations(df):
+    """Days between each DURATIONS pair of dates, NaN where either is missing or the close is a forecast."""
+    closed = df["Current Stage (as of data pull)"].isin(CLOSED_STAGES)
+    days = {}
+    for name, (start, end) in DURATIONS.items():
+        days[name] = (df[end] - df[start]) / pd.Timedelta(days=1)
+        if end == CLOSE_DATE:
+            days[name] = days[name].where(closed)
+    return pd.DataFrame(days, index=df.index)
+
+
+def bucket_of(days):
+    """Sketch bucket of each duration in ``days`` (a float array without NaN)."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        buckets = np.ceil(np.log(days) / np.log(GAMMA))
+    return np.where(days >= MIN_DAYS, buckets, ZERO_BUCKET).astype("int16")
+
+
+def bucket_value(buckets):
+    """Representative duration of each bucket, within RELATIVE_ACCURACY of every value in it."""
+    buckets = np.asarray(buckets)
+    return np.where(buckets == ZERO_BUCKET, 0.0, 2 * GAMMA ** buckets.astype("float64") / (GAMMA + 1))
+
+
+def build_sketches(df):
+    """Bucket counts per (DURATION_DIMENSIONS cell, Duration, Bucket).
+
+    Missing dimension values are kept as their own cells. Quarter
+    dimensions are stored as strings ("2024Q1").
+    """
+    keys = df[DURATION_DIMENSIONS].assign(
+        **{col: df[col].astype(str).where(df[col].notna()) for col in QUARTER_DIMENSIONS}
+    )
+    # Group the rows into cells once, then count (cell, bucket) pairs per duration.
+    cells = keys.groupby(DURATION_DIMENSIONS, dropna=False, observed=True)
+    codes = cells.ngroup().to_numpy()
+    cell_keys = cells.size().index.to_frame(index=False)
+    parts = []
+    for name, days in stage_durations(df).items():
+        present = days.notna().to_numpy()
+        offset = bucket_of(days.to_numpy()[present]).astype("int64") - ZERO_BUCKET
+        pairs, counts = np.unique(codes[present] * 2**16 + offset, return_counts=True)
+        parts.append(cell_keys.take(pairs // 2**16).reset_index(drop=True).assign(
+            Duration=pd.Categorical([name] * len(pairs), categories=list(DURATIONS)),
+            Bucket=(pairs % 2**16 + ZERO_BUCKET).astype("int16"), Count=counts,
+        ))
+    return pd.concat(parts, ignore_index=True)
+
+
+def merge_sketches(parts):
+    """Fold sketch stores built over disjoint sets of rows into one."""
+    sketches = pd.concat(parts, ignore_index=True)
+    return sketches.groupby(DURATION_DIMENSIONS + ["Duration", "Bucket"], dropna=False, observed=True)["Count"] \
+        .sum().reset_index()
+
+
+def subtract_sketches(sketches, part):
+    """Remove the rows ``part`` was built from; emptied buckets are dropped."""
+    merged = merge_sketches([sketches, part.assign(Count=-part["Count"])])
+    return merged[merged["Count"] > 0].reset_index(drop=True)
+
+
+def quantiles(sketches, by=(), qs=(0.5, 0.9), selections=None):
+    """Duration quantiles per ``by`` group and Duration, merged from the bucket counts.
+
+    ``selections`` is a ``{column: selected values}`` mapping over
+    DURATION_DIMENSIONS. Returns a frame indexed by ``by`` + Duration with a
+    ``Count`` column and one ``p<q>`` column (days) per quantile.
+    """
+    keep = np.ones(len(sketches), dtype=bool)
+    for col, selected in (selections or {}).items():
+        if len(selected):
+            keep &= sketches[col].isin(list(selected)).to_numpy()
+    groups = list(by) + ["Duration"]
+    counts = sketches[keep].groupby(groups + ["Bucket"], observed=True)["Count"].sum()
+    cumulative = counts.groupby(level=groups, observed=True).cumsum()
+    total = counts.groupby(level=groups, observed=True).transform("sum")
+    buckets = counts.index.get_level_values("Bucket")
+
+    result = {"Count": counts.groupby(level=groups, observed=True).sum()}
+    for q in qs:
+        # First bucket whose cumulative count passes rank q * (n - 1), as in DDSketch.
+        reached = (cumulative > q * (total - 1)).to_numpy()
+        first = pd.Series(buckets[reached], index=counts.index[reached].droplevel("Bucket"))
+        first = first[~first.index.duplicated()]
+        result[f"p{round(q * 100):g}"] = pd.Series(bucket_value(first.to_numpy()), index=first.index)
+    return pd.DataFrame(result)
+
+
+def get_sketches(df):
+    """Sketch store for a frame returned by ``load_data``, built once per dataset version."""
+    return per_version(df, "durations", build_sketches)
+
+
+INGEST_AGGREGATES["durations"] = (build_sketches, merge_sketches, subtract_sketches)
+PRECOMPUTE["durations"] = build_sketches
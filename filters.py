@@ -0,0 +1,167 @@
+import numpy as np
+import pandas as pd
+
+from cube import get_cube
+from data_loader import PRECOMPUTE, per_version
+
+FILTER_COLUMNS = [
+    "Opportunity Owner", "Segment", "Type", "Source", "Inbound Type",
+    "Created Quarter", "Close Quarter", "Reference Quarter", "Deal Size Band", "Source File",
+]
+ACV_COLUMN = "Base Annual Contract Value"
+# Facets also count by the cube's "Has ACV", for pages that drop rows without an ACV.
+FACET_COLUMNS = FILTER_COLUMNS + ["Has ACV"]
+
+
+class FilterIndex:
+    """Packed bitmaps per distinct filter value plus an ACV sort order.
+
+    Built once per dataset version; selections are answered with bitmap
+    OR (within a column) and AND (across columns) and only the final row
+    mask is unpacked, so filtering never materialises intermediate frames.
+    Values are keyed by their string form, e.g. quarters as "2024Q1".
+    """
+
+    def __init__(self, df, columns=FILTER_COLUMNS):
+        self.n = len(df)
+        self.bitmaps = {}
+        for col in columns:
+            if col not in df.columns:
+                continue
+            codes, uniques = pd.factorize(df[col], sort=True)
+            self.bitmaps[col] = {
+                str(value): np.packbits(codes == i) for i, value in enumerate(uniques)
+            }
+
+        acv = df[ACV_COLUMN].to_numpy(dtype="float64")
+        self._acv_order = np.argsort(acv, kind="stable")  # NaN sorts last
+        self._acv_sorted = acv[self._acv_order][: int(np.count_nonzero(~np.isnan(acv)))]
+
+    def acv_bounds(self):
+        if not len(self._acv_sorted):
+            return 0.0, 0.0
+        return float(self._acv_sorted[0]), float(self._acv_sorted[-1])
+
+    def mask(self, selections=None, acv_range=None):
+        """Boolean row mask for ``{column: selected values}`` and an optional ACV range.
+
+        Columns with an empty selection are not filtered; rows with a missing
+        ACV are excluded whenever ``acv_range`` is given.
+        """
+        return np.unpackbits(self._bits(selections, acv_range), count=self.n).astype(bool)
+
+    def _bits(self, selections=None, acv_range=None):
+        bits = np.packbits(np.ones(self.n, dtype=bool))
+        for col, selected in (selections or {}).items():
+            if not len(selected):
+                continue
+            col_bits = np.zeros_like(bits)
+            bitmaps = self.bitmaps[col]
+            for value in selected:
+                bitmap = bitmaps.get(str(value))
+                if bitmap is not None:
+                    col_bits |= bitmap
+            bits &= col_bits
+        if acv_range is not None:
+            bits &= self._acv_bits(*acv_range)
+        return bits
+
+    def _acv_bits(self, low, high):
+        start = np.searchsorted(self._acv_sorted, low, side="left")
+        stop = np.searchsorted(self._acv_sorted, high, side="right")
+        rows = np.zeros(self.n, dtype=bool)
+        rows[self._acv_order[start:stop]] = True
+        return np.packbits(rows)
+
+
+def get_index(df):
+    """FilterIndex for a frame returned by ``load_data``, built once per dataset version."""
+    return per_version(df, "filter_index", FilterIndex)
+
+
+class FacetIndex:
+    """Row counts per co-occurring combination of filter values, for cascading sidebar options.
+
+    Built from the cube's cells rather than the rows: each distinct
+    combination of FACET_COLUMNS values is one cell holding its row count,
+    and each column's values are stored as small integer codes per cell.
+    Option counts under a selection are a boolean lookup per selected
+    column and one ``np.bincount`` over the cells. Missing values get a
+    code of their own, so such rows only count while their column is
+    unfiltered, as with FilterIndex.
+    """
+
+    def __init__(self, cube, columns=FACET_COLUMNS):
+        cells = cube.groupby(list(columns), dropna=False, observed=True)["Row_Count"].sum()
+        cells = cells[cells > 0]
+        self.rows = cells.to_numpy(dtype="int64")
+        self.codes = {}
+        self.values_of = {}
+        self.lookup = {}
+        for col in columns:
+            codes, uniques = pd.factorize(cells.index.get_level_values(col), sort=True)
+            codes[codes < 0] = len(uniques)
+            self.codes[col] = codes
+            self.values_of[col] = [str(value) for value in uniques]
+            self.lookup[col] = {value: i for i, value in enumerate(self.values_of[col])}
+
+    def counts(self, col, selections=None, where=None):
+        """``{value: rows}`` for every value of ``col``, under ``where`` and the selections on other columns.
+
+        A column's own selection doesn't narrow its options, so picking
+        several values of one column stays possible; ``where`` applies to
+        every column, its own included.
+        """
+        keep = self._keep({c: v for c, v in (selections or {}).items() if c != col}, where)
+        codes, rows = (self.codes[col], self.rows) if keep is None else (self.codes[col][keep], self.rows[keep])
+        totals = np.bincount(codes, weights=rows, minlength=len(self.values_of[col]) + 1)
+        return dict(zip(self.values_of[col], totals[:-1].astype("int64").tolist()))
+
+    def _keep(self, *selections):
+        keep = None
+        for selection in selections:
+            for col, selected in (selection or {}).items():
+                if not len(selected):
+                    continue
+                allowed = np.zeros(len(self.values_of[col]) + 1, dtype=bool)
+                allowed[[self.lookup[col][str(v)] for v in selected if str(v) in self.lookup[col]]] = True
+                hit = allowed[self.codes[col]]
+                keep = hit if keep is None else keep & hit
+        return keep
+
+
+def _build_facets(df):
+    return FacetIndex(get_cube(df))
+
+
+def get_facets(df):
+    """FacetIndex for a frame returned by ``load_data``, built once per dataset version."""
+    return per_version(df, "facet_index", _build_facets)
+
+
+def cascading_multiselects(facets, columns, key, where=None, labels=None):
+    """Sidebar multiselects for ``columns`` offering only values still reachable under the others.
+
+    Each option shows its row count under the current selection; values
+    already selected stay listed even when nothing matches them any more.
+    Selections persist in ``st.session_state["<key>:<column>"]``. Returns
+    ``{column: selected values}``.
+    """
+    import streamlit as st  # deferred: the indexes above are used headless too
+
+    keys = {col: f"{key}:{col}" for col in columns}
+    selections = {col: list(st.session_state.get(keys[col], [])) for col in columns}
+    for col in columns:
+        counts = facets.counts(col, selections, where)
+        options = [value for value, rows in counts.items() if rows or value in selections[col]]
+        # Re-set the value: the labels (and so the widget's wire values) change with the counts.
+        st.session_state[keys[col]] = [value for value in selections[col] if value in counts]
+        selections[col] = st.multiselect(
+            (labels or {}).get(col, col), options, key=keys[col],
+            format_func=lambda value, counts=counts: f"{value} ({counts[value]:,})",
+        )
+    return selections
+
+
+PRECOMPUTE["filter_index"] = FilterIndex
+PRECOMPUTE["facet_index"] = _build_facets
@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+
+# Stage -> test for an opportunity having reached it, in funnel order.
+STAGES = {
+    "SQL": lambda df: df["SQL Datestamp"].notna(),
+    "SAL": lambda df: df["SAL Datestamp"].notna(),
+    "SQO": lambda df: df["SQO Datestamp"].notna(),
+    "Closed Won": lambda df: df["Funnel Stage Reached"] == "4 - Closed Won",
+}
+CONVERSIONS = [
+    ("SQL", "SAL", "SQL→SAL"),
+    ("SAL", "SQO", "SAL→SQO"),
+    ("SQO", "Closed Won", "SQO→Closed Won"),
+]
+
+
+def stage_matrix(df):
+    """One int8 flag column per stage: 1 if the opportunity reached it."""
+    return pd.DataFrame({stage: reached(df).astype("int8") for stage, reached in STAGES.items()}, index=df.index)
+
+
+def rollup(cube, by=()):
+    """Sum the cube down to the ``by`` levels; with no levels, the funnel totals.
+
+    Rows with a missing key are dropped and labels are returned as strings
+    (quarters as "2024Q1").
+    """
+    if not by:
+        return cube.sum()
+    return cube.groupby(level=list(by), observed=True).sum().rename(index=str)
+
+
+def conversion_rates(counts):
+    """Stage-to-stage conversion per row of a rolled-up count frame."""
+    rates = pd.DataFrame({label: counts[to] / counts[frm] for frm, to, label in CONVERSIONS})
+    return rates.replace([np.inf, -np.inf], np.nan)
@@ -0,0 +1,54 @@
+import pandas as pd
+
+from data_loader import widen
+
+ACV_COLUMN = "Base Annual Contract Value"
+
+# Value columns masked up front so each metric below is a plain groupby reduction
+# instead of a lambda that indexes back into the frame once per group.
+VALUE_COLUMNS = {
+    "AE Outbound ACV": lambda df: df[ACV_COLUMN].where(df["Source"] == "AE Outbound"),
+    "SDR Outbound ACV": lambda df: df[ACV_COLUMN].where(df["Source"] == "SDR Outbound"),
+    "Marketing ACV": lambda df: df[ACV_COLUMN].where(df["Source"].str.contains("Marketing", na=False)),
+}
+
+# Metric name -> (value column, groupby reduction)
+METRICS = {
+    "Bookings_ACV": ("Won ACV", "sum"),
+    "Total_ACV": (ACV_COLUMN, "sum"),
+    "Win_Count": ("Is_Won", "sum"),
+    "Total_Count": ("Is_Won", "count"),
+    "Win_Rate": ("Is_Won", "mean"),
+    "Avg_Deal_Size": ("Won ACV", "mean"),
+    "Avg_Sales_Cycle": ("Sales Cycle (Days)", "mean"),
+    "Deal_Velocity": ("Deal Velocity (Days)", "mean"),
+    "Total_Pipeline_Generated": ("Created Date", "count"),
+    "Pipeline_Generated_ACV": (ACV_COLUMN, "sum"),
+    "Pipeline_Count": (ACV_COLUMN, "count"),
+    "Avg_Pipeline_Deal_Size": (ACV_COLUMN, "mean"),
+    "AE_Outbound_Pipeline_ACV": ("AE Outbound ACV", "sum"),
+    "SDR_Outbound_Pipeline_ACV": ("SDR Outbound ACV", "sum"),
+    "Marketing_Pipeline_ACV": ("Marketing ACV", "sum"),
+}
+
+
+def aggregate(df, dims, metrics):
+    """Compute the named metrics per ``dims`` group in a single groupby pass.
+
+    ``metrics`` is a list of names from METRICS, or a mapping of output column
+    name to metric name when a page labels a metric differently. Only the
+    grouping and value columns the metrics need are taken from ``df``.
+    """
+    if not isinstance(metrics, dict):
+        metrics = {name: name for name in metrics}
+    specs = {out: METRICS[name] for out, name in metrics.items()}
+
+    needed = list(dict.fromkeys(col for col, _ in specs.values()))
+    frame = df[list(dims) + [col for col in needed if col not in VALUE_COLUMNS]]
+    masked = {col: VALUE_COLUMNS[col](df) for col in needed if col in VALUE_COLUMNS}
+    if masked:
+        frame = frame.assign(**masked)
+
+    return widen(frame).groupby(list(dims), observed=True).agg(
+        **{out: pd.NamedAgg(column=col, aggfunc=func) for out, (col, func) in specs.items()}
+    )
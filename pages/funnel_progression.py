@@ -1,148 +1,175 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
 from data_loader import load_data
+from filters import cascading_multiselects, get_facets
+from cube import get_cube, stage_counts
+from durations import DURATIONS, get_sketches, quantiles
+from funnel import conversion_rates, rollup
+from profiler import dataframe, plotly_chart, record, stage
+import charts
+import result_cache
+
+FILTER_COLUMNS = ["Opportunity Owner", "Segment", "Source", "Inbound Type", "Created Quarter", "Close Quarter", "Deal Size Band", "Source File"]
+BREAKDOWNS = ["Segment", "Source", "Inbound Type", "Opportunity Owner"]
+NEW_ONLY = {"Type": ["New"]}
+
+
+def compute(df, spec):
+    """Funnel views for new-business opportunities selected by ``spec``.
+
+    ``spec`` keys (all optional): ``filters`` ({column: values}) and
+    ``breakdown`` (a column to split the funnel totals by).
+    Returns a dict of frames: ``stage_counts`` (stage x close quarter),
+    ``conversion_scorecard``, ``funnel_totals``, ``conversion_by_created``,
+    ``conversion_by_close``, ``stage_durations`` (p50/p90 days per stage
+    transition, from the duration sketches) and, with a breakdown,
+    ``breakdown``.
+    """
+    record(spec=spec, rows_in=len(df))
+    breakdown = spec.get("breakdown")
+    by = [breakdown] if breakdown else []
+    with stage("aggregate"):
+        counts = stage_counts(get_cube(df), by=by, selections={**NEW_ONLY, **spec.get("filters", {})})
+        durations = quantiles(get_sketches(df), by=by, selections={**NEW_ONLY, **spec.get("filters", {})})
+
+    heatmap_pg = rollup(counts, ["Close Quarter"]).T
+    heatmap_pg = heatmap_pg.loc[:, heatmap_pg.any()]
+
+    df_conv = pd.DataFrame({
+        "SAL→SQL": heatmap_pg.loc["SAL"] / heatmap_pg.loc["SQL"],
+        "SQO→SAL": heatmap_pg.loc["SQO"] / heatmap_pg.loc["SAL"],
+        "Closed Won→SQO": heatmap_pg.loc["Closed Won"] / heatmap_pg.loc["SQO"]
+    }).T
+
+    totals = rollup(counts)
+    df_funnel = pd.DataFrame({"Stage": totals.index, "Opportunities": totals.values})
+    df_funnel["Conversion Rate"] = df_funnel["Opportunities"].div(df_funnel["Opportunities"].shift(1)).fillna(1).map("{:.1%}".format)
+
+    results = {
+        "stage_counts": heatmap_pg,
+        "conversion_scorecard": df_conv,
+        "funnel_totals": df_funnel,
+        "conversion_by_created": conversion_rates(rollup(counts, ["Created Quarter"])).T.dropna(axis=1, how="all"),
+        "conversion_by_close": conversion_rates(rollup(counts, ["Close Quarter"])).T.dropna(axis=1, how="all"),
+        "stage_durations": durations.round(1).reset_index(),
+    }
+    if breakdown:
+        results["breakdown"] = rollup(counts, [breakdown]).rename_axis(columns="Stage").stack().rename("Opportunities").reset_index()
+    record(rows_out=len(counts))
+    return results
+
 
 def render():
     st.header("🔁 Funnel Progression Analysis")
-    df = load_data()
-    df = df[df["Type"] == "New"].copy()
+    with stage("load_data"):
+        df = load_data()
+    with stage("filter"):
+        facets = get_facets(df)
 
     with st.sidebar:
         st.subheader("🔍 Filters")
-        owners = st.multiselect("Opportunity Owner", df["Opportunity Owner"].dropna().unique())
-        segments = st.multiselect("Segment", df["Segment"].dropna().unique())
-        sources = st.multiselect("Source", df["Source"].dropna().unique())
-        inbound = st.multiselect("Inbound Type", df["Inbound Type"].dropna().unique())
-        created_qtrs = st.multiselect("Created Quarter", df["Created Quarter"].dropna().astype(str).unique())
-        close_qtrs = st.multiselect("Close Quarter", df["Close Quarter"].dropna().astype(str).unique())
-        bands = st.multiselect("Deal Size Band", df["Deal Size Band"].dropna().unique())
-
-    if owners: df = df[df["Opportunity Owner"].isin(owners)]
-    if segments: df = df[df["Segment"].isin(segments)]
-    if sources: df = df[df["Source"].isin(sources)]
-    if inbound: df = df[df["Inbound Type"].isin(inbound)]
-    if created_qtrs: df = df[df["Created Quarter"].astype(str).isin(created_qtrs)]
-    if close_qtrs: df = df[df["Close Quarter"].astype(str).isin(close_qtrs)]
-    if bands: df = df[df["Deal Size Band"].isin(bands)]
+        selections = cascading_multiselects(facets, FILTER_COLUMNS, key="funnel_progression", where=NEW_ONLY)
+
+        st.subheader("📊 Breakdown")
+        breakdown = st.selectbox("Funnel Totals By", [""] + BREAKDOWNS, index=0)
+
+    spec = {"filters": selections, "breakdown": breakdown}
+    results = result_cache.results("funnel_progression", df, spec, compute)
+
+    import plotly.express as px  # deferred until a chart is drawn
 
     # -------------------------
     # 📊 PG SCORECARD (COUNTS)
     # -------------------------
-    st.subheader("📊 PG Scorecard (Heatmap of Stage Counts)")
-    stages_pg = {
-        "SQL": "SQL Datestamp",
-        "SAL": "SAL Datestamp",
-        "SQO": "SQO Datestamp",
-        "Closed Won": "Close Date"
-    }
-
-    pg_data = []
-    for stage_name, stage_col in stages_pg.items():
-        if stage_name == "Closed Won":
-            temp_df = df[df["Funnel Stage Reached"] == "4 - Closed Won"].copy()
-        else:
-            temp_df = df[df[stage_col].notna()].copy()
-        temp_df["Close Quarter"] = temp_df["Close Quarter"].astype(str)
-        count_by_qtr = temp_df.groupby("Close Quarter").size().reset_index(name="Count")
-        count_by_qtr["Stage"] = stage_name
-        pg_data.append(count_by_qtr)
-
-    df_pg = pd.concat(pg_data)
-    df_pg["Stage"] = pd.Categorical(df_pg["Stage"], categories=["SQL", "SAL", "SQO", "Closed Won"], ordered=True)
-    heatmap_pg = df_pg.pivot(index="Stage", columns="Close Quarter", values="Count").fillna(0)
-
-    fig_pg = px.imshow(
-        heatmap_pg,
-        text_auto=True,
-        color_continuous_scale="blues",
-        labels=dict(x="Close Quarter", y="Stage", color="Count"),
-        title="PG Scorecard – Stage Counts by Close Quarter"
-    )
-    st.plotly_chart(fig_pg, use_container_width=True)
+    section = charts.section("📊 PG Scorecard (Heatmap of Stage Counts)", key="funnel_progression:stage_counts", expanded=True)
+    if section.open:
+        with section:
+            with stage("figure"):
+                fig_pg = charts.figure("funnel_progression", df, "stage_counts", results["stage_counts"], lambda: px.imshow(
+                    results["stage_counts"],
+                    text_auto=True,
+                    color_continuous_scale="blues",
+                    labels=dict(x="Close Quarter", y="Stage", color="Count"),
+                    title="PG Scorecard – Stage Counts by Close Quarter"
+                ))
+            plotly_chart(fig_pg, use_container_width=True)
 
     # -------------------------
     # 📈 PG CONVERSION SCORECARD
     # -------------------------
-    st.subheader("📈 PG Conversion Rate Scorecard")
-    try:
-        sql = heatmap_pg.loc["SQL"]
-        sal = heatmap_pg.loc["SAL"]
-        sqo = heatmap_pg.loc["SQO"]
-        won = heatmap_pg.loc["Closed Won"]
-
-        sal_rate = sal / sql
-        sqo_rate = sqo / sal
-        won_rate = won / sqo
-
-        df_conv = pd.DataFrame({
-            "SAL→SQL": sal_rate,
-            "SQO→SAL": sqo_rate,
-            "Closed Won→SQO": won_rate
-        }).T
-
-        fig_conv = px.imshow(
-            df_conv,
-            text_auto=".1%",
-            color_continuous_scale="greens",
-            labels=dict(x="Close Quarter", y="Conversion Step", color="Conversion %"),
-            title="PG Conversion Rate Scorecard"
-        )
-        st.plotly_chart(fig_conv, use_container_width=True)
-    except Exception as e:
-        st.warning(f"Unable to compute conversion rate scorecard: {e}")
+    section = charts.section("📈 PG Conversion Rate Scorecard", key="funnel_progression:conversion_scorecard")
+    if section.open:
+        with section:
+            try:
+                with stage("figure"):
+                    fig_conv = charts.figure("funnel_progression", df, "conversion_scorecard", results["conversion_scorecard"], lambda: px.imshow(
+                        results["conversion_scorecard"],
+                        text_auto=".1%",
+                        color_continuous_scale="greens",
+                        labels=dict(x="Close Quarter", y="Conversion Step", color="Conversion %"),
+                        title="PG Conversion Rate Scorecard"
+                    ))
+                plotly_chart(fig_conv, use_container_width=True)
+            except Exception as e:
+                st.warning(f"Unable to compute conversion rate scorecard: {e}")
 
     # -------------------------
     # 📊 FUNNEL TOTALS
     # -------------------------
-    st.subheader("📊 Funnel Totals (All Opportunities)")
-    funnel = {
-        "SQL": df["SQL Datestamp"].notna().sum(),
-        "SAL": df["SAL Datestamp"].notna().sum(),
-        "SQO": df["SQO Datestamp"].notna().sum(),
-        "Closed Won": (df["Funnel Stage Reached"] == "4 - Closed Won").sum()
-    }
-    df_funnel = pd.DataFrame({"Stage": list(funnel.keys()), "Opportunities": list(funnel.values())})
-    df_funnel["Conversion Rate"] = df_funnel["Opportunities"].div(df_funnel["Opportunities"].shift(1)).fillna(1).map("{:.1%}".format)
-    st.plotly_chart(px.bar(df_funnel, x="Stage", y="Opportunities", text="Opportunities", title="Funnel Stage Totals"))
-    st.dataframe(df_funnel)
+    section = charts.section("📊 Funnel Totals (All Opportunities)", key="funnel_progression:funnel_totals", expanded=True)
+    if section.open:
+        with section:
+            df_funnel = results["funnel_totals"]
+            with stage("figure"):
+                fig = charts.figure("funnel_progression", df, "funnel_totals", df_funnel, lambda: px.bar(
+                    df_funnel, x="Stage", y="Opportunities", text="Opportunities", title="Funnel Stage Totals"))
+            plotly_chart(fig)
+            dataframe(df_funnel)
+
+            if breakdown:
+                with stage("figure"):
+                    fig = charts.figure("funnel_progression", df, "breakdown", results["breakdown"], lambda: px.bar(
+                        results["breakdown"], x="Stage", y="Opportunities", color=breakdown, barmode="group",
+                        title=f"Funnel Stage Totals by {breakdown}"))
+                plotly_chart(fig)
 
     # -------------------------
     # 📊 CONVERSION HEATMAPS
     # -------------------------
-    stage_pairs = [
-        ("SQL Datestamp", "SAL Datestamp", "SQL→SAL"),
-        ("SAL Datestamp", "SQO Datestamp", "SAL→SQO"),
-        ("SQO Datestamp", "Funnel Stage Reached", "SQO→Closed Won")
-    ]
-
-    for group_type, label in [("Created Quarter", "Created"), ("Close Quarter", "Close")]:
-        st.subheader(f"📊 Conversion % Heatmap by {label} Quarter")
-        data = []
-
-        for from_col, to_col, stage_label in stage_pairs:
-            from_df = df[df[from_col].notna()].copy()
-            from_df[group_type] = from_df[group_type].astype(str)
-            total_from = from_df.groupby(group_type).size()
-
-            if to_col == "Funnel Stage Reached":
-                to_df = df[df["Funnel Stage Reached"] == "4 - Closed Won"].copy()
-            else:
-                to_df = df[df[to_col].notna()].copy()
-            to_df[group_type] = to_df[group_type].astype(str)
-            total_to = to_df.groupby(group_type).size()
-
-            conversion = (total_to / total_from).replace([float("inf"), -float("inf")], None)
-            for qtr, val in conversion.items():
-                data.append({"Quarter": qtr, "Stage": stage_label, "Conversion": val})
-
-        if data:
-            df_heat = pd.DataFrame(data).pivot(index="Stage", columns="Quarter", values="Conversion")
-            fig = px.imshow(
-                df_heat,
-                text_auto=".1%",
-                color_continuous_scale="blues" if label == "Created" else "greens",
-                title=f"Conversion % by {label} Quarter",
-                labels=dict(x=f"{label} Quarter", y="Stage", color="Conversion %")
-            )
-            st.plotly_chart(fig, use_container_width=True)
+    for key, label in [("conversion_by_created", "Created"), ("conversion_by_close", "Close")]:
+        section = charts.section(f"📊 Conversion % Heatmap by {label} Quarter", key=f"funnel_progression:{key}")
+        df_heat = results[key]
+
+        if section.open and not df_heat.empty:
+            with section:
+                with stage("figure"):
+                    fig = charts.figure("funnel_progression", df, key, df_heat, lambda: px.imshow(
+                        df_heat,
+                        text_auto=".1%",
+                        color_continuous_scale="blues" if label == "Created" else "greens",
+                        title=f"Conversion % by {label} Quarter",
+                        labels=dict(x=f"{label} Quarter", y="Stage", color="Conversion %")
+                    ))
+                plotly_chart(fig, use_container_width=True)
+
+    # -------------------------
+    # ⏱ STAGE DURATIONS
+    # -------------------------
+    section = charts.section("⏱ Days Between Stages (p50 / p90)", key="funnel_progression:stage_durations")
+    df_durations = results["stage_durations"]
+    if section.open and not df_durations.empty:
+        with section:
+            with stage("figure"):
+                fig = charts.figure("funnel_progression", df, "stage_durations", df_durations, lambda: px.bar(
+                    df_durations.melt(id_vars=["Duration"] + ([breakdown] if breakdown else []), value_vars=["p50", "p90"],
+                                      var_name="Quantile", value_name="Days"),
+                    x="Duration", y="Days",
+                    color=breakdown if breakdown else "Quantile",
+                    facet_col="Quantile" if breakdown else None,
+                    barmode="group",
+                    category_orders={"Duration": list(DURATIONS)},
+                    title="Days Between Stages" + (f" by {breakdown}" if breakdown else "")
+                ), breakdown=breakdown)
+            plotly_chart(fig, use_container_width=True)
+            st.caption("Durations ending at Close count closed (won or lost) opportunities only.")
+            dataframe(df_durations, hide_index=True)
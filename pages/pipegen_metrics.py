@@ -1,63 +1,90 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
 from data_loader import load_data
+from filters import cascading_multiselects, get_facets, get_index
+from cube import grouped_metrics
+import charts
+import result_cache
+from profiler import dataframe, plotly_chart, record, stage
+
+# Rows without an ACV are always dropped here (as by the ACV slider at full range).
+HAS_ACV = {"Has ACV": [True]}
+FILTER_COLUMNS = ["Opportunity Owner", "Segment", "Type", "Source", "Inbound Type", "Created Quarter", "Close Quarter", "Deal Size Band", "Source File"]
+DIMENSIONS = ["Opportunity Owner", "Segment", "Type", "Source", "Inbound Type", "Deal Size Band"]
+METRICS = {
+    "Pipeline_Generated_ACV": "Pipeline_Generated_ACV",
+    "Pipeline_Count": "Pipeline_Count",
+    "Avg_Deal_Size": "Avg_Pipeline_Deal_Size",
+}
+
+
+def compute(df, spec):
+    """Pipeline generated per Created Quarter for the opportunities selected by ``spec``.
+
+    ``spec`` keys (all optional): ``filters`` ({column: values}), ``acv_range``
+    ((low, high); None means the full range) and ``dims`` (extra color/facet
+    dimensions after Created Quarter; blanks are skipped).
+    Returns ``{"grouped": frame}``.
+    """
+    record(spec=spec, rows_in=len(df))
+    selections = spec.get("filters", {})
+    acv_range = spec.get("acv_range")
+
+    dimensions = ["Created Quarter"]
+    for d in spec.get("dims", []):
+        if d and d in df.columns and d not in dimensions:
+            dimensions.append(d)
+
+    with stage("aggregate"):
+        df_grouped = grouped_metrics(df, dimensions, METRICS, selections, acv_range, has_acv=True).reset_index()
+    record(rows_selected=int(df_grouped["Pipeline_Count"].sum()))
+
+    if "Created Quarter" in df_grouped.columns:
+        df_grouped["Created Quarter"] = df_grouped["Created Quarter"].astype(str)
+
+    record(rows_out=len(df_grouped))
+    return {"grouped": df_grouped}
+
 
 def render():
-    df = load_data()
+    with stage("load_data"):
+        df = load_data()
+    with stage("filter"):
+        index = get_index(df)
+        facets = get_facets(df)
     st.header("📥 PipeGen Metrics")
 
     with st.sidebar:
         st.subheader("🔍 Filters")
-        owners = st.multiselect("Opportunity Owner", df["Opportunity Owner"].dropna().unique())
-        segments = st.multiselect("Segment", df["Segment"].dropna().unique())
-        types = st.multiselect("Type", df["Type"].dropna().unique())
-        sources = st.multiselect("Source", df["Source"].dropna().unique())
-        inbound = st.multiselect("Inbound Type", df["Inbound Type"].dropna().unique())
-        created_qtrs = st.multiselect("Created Quarter", df["Created Quarter"].dropna().astype(str).unique())
-        close_qtrs = st.multiselect("Close Quarter", df["Close Quarter"].dropna().astype(str).unique())
-        bands = st.multiselect("Deal Size Band", df["Deal Size Band"].dropna().unique())
-        acv_min, acv_max = float(df["Base Annual Contract Value"].min()), float(df["Base Annual Contract Value"].max())
+        selections = cascading_multiselects(facets, FILTER_COLUMNS, key="pipegen_metrics", where=HAS_ACV)
+        acv_min, acv_max = index.acv_bounds()
         acv_range = st.slider("Base Annual Contract Value Range", min_value=acv_min, max_value=acv_max, value=(acv_min, acv_max))
 
         st.subheader("📊 Breakdown Dimensions")
-        options = ["Opportunity Owner", "Segment", "Type", "Source", "Inbound Type", "Deal Size Band"]
         dim1 = st.selectbox("Dimension 1 (X-axis)", ["Created Quarter"])
-        dim2 = st.selectbox("Dimension 2 (Color)", [""] + options, index=0)
-        dim3 = st.selectbox("Dimension 3 (Facet Row)", [""] + options, index=0)
-
-    df_filtered = df.copy()
-    if owners: df_filtered = df_filtered[df_filtered["Opportunity Owner"].isin(owners)]
-    if segments: df_filtered = df_filtered[df_filtered["Segment"].isin(segments)]
-    if types: df_filtered = df_filtered[df_filtered["Type"].isin(types)]
-    if sources: df_filtered = df_filtered[df_filtered["Source"].isin(sources)]
-    if inbound: df_filtered = df_filtered[df_filtered["Inbound Type"].isin(inbound)]
-    if created_qtrs: df_filtered = df_filtered[df_filtered["Created Quarter"].astype(str).isin(created_qtrs)]
-    if close_qtrs: df_filtered = df_filtered[df_filtered["Close Quarter"].astype(str).isin(close_qtrs)]
-    if bands: df_filtered = df_filtered[df_filtered["Deal Size Band"].isin(bands)]
-    df_filtered = df_filtered[df_filtered["Base Annual Contract Value"].between(*acv_range)]
+        dim2 = st.selectbox("Dimension 2 (Color)", [""] + DIMENSIONS, index=0)
+        dim3 = st.selectbox("Dimension 3 (Facet Row)", [""] + DIMENSIONS, index=0)
 
-    dimensions = ["Created Quarter"]
-    for d in [dim2, dim3]:
-        if d and d in df_filtered.columns:
-            dimensions.append(d)
-
-    df_grouped = df_filtered.groupby(dimensions).agg(
-        Pipeline_Generated_ACV=("Base Annual Contract Value", "sum"),
-        Pipeline_Count=("Base Annual Contract Value", "count"),
-        Avg_Deal_Size=("Base Annual Contract Value", "mean")
-    ).reset_index()
-
-    if "Created Quarter" in df_grouped.columns:
-        df_grouped["Created Quarter"] = df_grouped["Created Quarter"].astype(str)
+    spec = {
+        "filters": selections,
+        "acv_range": None if acv_range == (acv_min, acv_max) else acv_range,
+        "dims": [dim2, dim3],
+    }
+    df_grouped = result_cache.results("pipegen_metrics", df, spec, compute)["grouped"]
 
-    fig = px.bar(df_grouped,
-                 x="Created Quarter",
-                 y="Pipeline_Generated_ACV",
-                 color=dim2 if dim2 else None,
-                 facet_row=dim3 if dim3 else None,
-                 barmode="group",
-                 title="Pipeline Generated ACV by Created Quarter")
-    st.plotly_chart(fig, use_container_width=True)
+    import plotly.express as px  # deferred until a chart is drawn
+    rows, note = charts.cap_points(df_grouped, ["Created Quarter", dim2, dim3], "Pipeline_Generated_ACV")
+    with stage("figure"):
+        fig = charts.figure("pipegen_metrics", df, "pipeline", rows, lambda: px.bar(
+            rows,
+            x="Created Quarter",
+            y="Pipeline_Generated_ACV",
+            color=dim2 if dim2 else None,
+            facet_row=dim3 if dim3 else None,
+            barmode="group",
+            title="Pipeline Generated ACV by Created Quarter"
+        ), dims=[dim2, dim3])
+    plotly_chart(fig, use_container_width=True)
+    if note:
+        st.caption(note)
 
-    st.dataframe(df_grouped)
+    dataframe(df_grouped)
@@ -1,56 +1,47 @@
 import streamlit as st
-import pandas as pd
 from data_loader import load_data
-
-def render():
-    st.header("🧑‍💼 Rep Scorecards")
-
-    df = load_data()
-    df = df[df["Opportunity Owner"].notna()].copy()
-
-    df["Created Qtr"] = df["Created Date"].dt.to_period("Q").astype(str)
-    df["Closed Qtr"] = df["Close Date"].dt.to_period("Q").astype(str)
-    df["Reference Quarter"] = df["Created Qtr"].combine_first(df["Closed Qtr"])
-
-    with st.sidebar:
-        st.subheader("Filters")
-        segments = st.multiselect("Segment", df["Segment"].dropna().unique())
-        sources = st.multiselect("Source", df["Source"].dropna().unique())
-        ref_qtrs = st.multiselect("Reference Quarter (Bookings)", df["Reference Quarter"].dropna().unique())
-        created_qtrs = st.multiselect("Created Quarter (Pipeline)", df["Created Qtr"].dropna().unique())
-
-    # Filter for Bookings
-    df_bookings = df.copy()
-    if segments: df_bookings = df_bookings[df_bookings["Segment"].isin(segments)]
-    if sources: df_bookings = df_bookings[df_bookings["Source"].isin(sources)]
-    if ref_qtrs: df_bookings = df_bookings[df_bookings["Reference Quarter"].isin(ref_qtrs)]
-
-    # Filter for Pipeline
-    df_pipeline = df.copy()
-    if segments: df_pipeline = df_pipeline[df_pipeline["Segment"].isin(segments)]
-    if sources: df_pipeline = df_pipeline[df_pipeline["Source"].isin(sources)]
-    if created_qtrs: df_pipeline = df_pipeline[df_pipeline["Created Qtr"].isin(created_qtrs)]
-
-    # Bookings & Win Rate
-    grouped_all = df_bookings.groupby(["Opportunity Owner", "Segment"]).agg(
-        Bookings_ACV=("Base Annual Contract Value", lambda x: x[df_bookings.loc[x.index, "Is_Won"]].sum()),
-        Win_Count=("Is_Won", "sum"),
-        Total_Count=("Is_Won", "count"),
-        Win_Rate=("Is_Won", lambda x: x.sum() / x.count() if x.count() > 0 else 0),
-        Avg_Deal_Size=("Base Annual Contract Value", lambda x: x[df_bookings.loc[x.index, "Is_Won"]].mean()),
-        Deal_Velocity=("Deal Velocity (Days)", "mean")
-    )
-
-    # Pipeline metrics from Created Quarter filter
-    grouped_pipe = df_pipeline.groupby(["Opportunity Owner", "Segment"]).agg(
-        Total_Pipeline_Generated=("Created Date", "count"),
-        Pipeline_Generated_ACV=("Base Annual Contract Value", "sum"),
-        AE_Outbound_Pipeline_ACV=("Base Annual Contract Value", lambda x: x[df_pipeline.loc[x.index, "Source"] == "AE Outbound"].sum()),
-        SDR_Outbound_Pipeline_ACV=("Base Annual Contract Value", lambda x: x[df_pipeline.loc[x.index, "Source"] == "SDR Outbound"].sum()),
-        Marketing_Pipeline_ACV=("Base Annual Contract Value", lambda x: x[df_pipeline.loc[x.index, "Source"].str.contains("Marketing", na=False)].sum())
-    )
-
-    grouped = grouped_all.join(grouped_pipe, how="outer").reset_index()
+from filters import cascading_multiselects, get_facets
+from cube import grouped_metrics
+import result_cache
+from profiler import record, stage
+from tables import bands, paged_table
+
+# Metric -> (low, high) thresholds for its Low / Mid / High band column.
+BANDS = {
+    "Bookings_ACV": (25_000, 75_000),
+    "Win Rate": (30, 50),
+    "Pipeline_Generated_ACV": (50_000, 150_000),
+}
+MONEY_COLUMNS = [
+    "Bookings_ACV", "Avg_Deal_Size", "Pipeline_Generated_ACV",
+    "AE_Outbound_Pipeline_ACV", "SDR_Outbound_Pipeline_ACV", "Marketing_Pipeline_ACV",
+]
+
+def compute(df, spec):
+    """Per-rep scorecard (owner x segment) for the opportunities selected by ``spec``.
+
+    ``spec`` keys (all optional): ``filters`` ({column: values}, applied to
+    both halves), ``bookings_quarters`` (Reference Quarters for bookings and
+    win rate) and ``pipeline_quarters`` (Created Quarters for pipeline).
+    Returns ``{"scorecard": frame}`` with rounded metric columns.
+    """
+    record(spec=spec, rows_in=len(df))
+    filters = spec.get("filters", {})
+    # Rows without an owner drop out of the owner grouping
+    with stage("aggregate"):
+        # Bookings & Win Rate
+        grouped_all = grouped_metrics(df, ["Opportunity Owner", "Segment"], [
+            "Bookings_ACV", "Win_Count", "Total_Count", "Win_Rate", "Avg_Deal_Size", "Deal_Velocity",
+        ], {**filters, "Reference Quarter": spec.get("bookings_quarters", [])})
+
+        # Pipeline metrics from Created Quarter filter
+        grouped_pipe = grouped_metrics(df, ["Opportunity Owner", "Segment"], [
+            "Total_Pipeline_Generated", "Pipeline_Generated_ACV",
+            "AE_Outbound_Pipeline_ACV", "SDR_Outbound_Pipeline_ACV", "Marketing_Pipeline_ACV",
+        ], {**filters, "Created Quarter": spec.get("pipeline_quarters", [])})
+
+        grouped = grouped_all.join(grouped_pipe, how="outer").reset_index()
+    record(rows_selected=int(grouped_all["Total_Count"].sum()))
     grouped.fillna(0, inplace=True)
 
     # Format columns
@@ -62,59 +53,59 @@ def render():
     grouped["AE_Outbound_Pipeline_ACV"] = grouped["AE_Outbound_Pipeline_ACV"].round(0)
     grouped["SDR_Outbound_Pipeline_ACV"] = grouped["SDR_Outbound_Pipeline_ACV"].round(0)
     grouped["Marketing_Pipeline_ACV"] = grouped["Marketing_Pipeline_ACV"].round(0)
+    for col, (low, high) in BANDS.items():
+        grouped[f"{col} Band"] = bands(grouped[col], low, high)
 
-    # -------------------------------
-    # Simplified Scorecard + Styling
-    # -------------------------------
-    st.subheader("📊 Simplified Rep Scorecard")
-    simplified = grouped[[
-        "Opportunity Owner", "Segment", "Bookings_ACV", "Win Rate",
-        "Total_Pipeline_Generated", "Pipeline_Generated_ACV"
-    ]].copy()
+    record(rows_out=len(grouped))
+    return {"scorecard": grouped}
 
-    def style_pipeline(val):
-        if val < 50000:
-            return "background-color: lightcoral"
-        elif val > 150000:
-            return "background-color: lightgreen"
-        else:
-            return "background-color: khaki"
 
-    def style_bookings(val):
-        if val < 25000:
-            return "background-color: lightcoral"
-        elif val > 75000:
-            return "background-color: lightgreen"
-        else:
-            return "background-color: khaki"
+def render():
+    st.header("🧑‍💼 Rep Scorecards")
 
-    def style_winrate(val):
-        if val < 30:
-            return "background-color: lightcoral"
-        elif val > 50:
-            return "background-color: lightgreen"
-        return ""
+    with stage("load_data"):
+        df = load_data()
+    with stage("filter"):
+        facets = get_facets(df)
+    has_owner = {"Opportunity Owner": facets.values_of["Opportunity Owner"]}
 
-    styled = simplified.style.format({
-        "Bookings_ACV": "${:,.0f}",
-        "Win Rate": "{:.1f}%",
-        "Pipeline_Generated_ACV": "${:,.0f}"
-    }).applymap(style_bookings, subset=["Bookings_ACV"]) \
-      .applymap(style_pipeline, subset=["Pipeline_Generated_ACV"]) \
-      .applymap(style_winrate, subset=["Win Rate"])
+    with st.sidebar:
+        st.subheader("Filters")
+        scope = cascading_multiselects(facets, ["Segment", "Source", "Source File"], key="rep_scorecards", where=has_owner)
+        # Bookings and pipeline quarters filter different measures, so they don't narrow each other.
+        ref_qtrs = cascading_multiselects(
+            facets, ["Reference Quarter"], key="rep_scorecards/bookings", where={**has_owner, **scope},
+            labels={"Reference Quarter": "Reference Quarter (Bookings)"},
+        )["Reference Quarter"]
+        created_qtrs = cascading_multiselects(
+            facets, ["Created Quarter"], key="rep_scorecards/pipeline", where={**has_owner, **scope},
+            labels={"Created Quarter": "Created Quarter (Pipeline)"},
+        )["Created Quarter"]
+
+    grouped = result_cache.results("rep_scorecards", df, {
+        "filters": scope,
+        "bookings_quarters": ref_qtrs,
+        "pipeline_quarters": created_qtrs,
+    }, compute)["scorecard"]
+
+    column_config = {
+        **{col: st.column_config.NumberColumn(format="dollar", step=1) for col in MONEY_COLUMNS},
+        "Win Rate": st.column_config.NumberColumn(format="%.1f%%"),
+    }
 
-    st.dataframe(styled, use_container_width=True)
+    # -------------------------------
+    # Simplified Scorecard + Bands
+    # -------------------------------
+    st.subheader("📊 Simplified Rep Scorecard")
+    simplified = grouped[[
+        "Opportunity Owner", "Segment", "Bookings_ACV", "Bookings_ACV Band", "Win Rate", "Win Rate Band",
+        "Total_Pipeline_Generated", "Pipeline_Generated_ACV", "Pipeline_Generated_ACV Band"
+    ]]
+    paged_table(simplified, "rep_scorecards/simplified", ["Opportunity Owner", "Segment"], column_config)
 
     # ------------------------
     # Detailed View
     # ------------------------
     st.subheader("📋 Detailed Scorecard")
-    st.dataframe(grouped.style.format({
-        "Bookings_ACV": "${:,.0f}",
-        "Win Rate": "{:.1f}%",
-        "Avg_Deal_Size": "${:,.0f}",
-        "Pipeline_Generated_ACV": "${:,.0f}",
-        "AE_Outbound_Pipeline_ACV": "${:,.0f}",
-        "SDR_Outbound_Pipeline_ACV": "${:,.0f}",
-        "Marketing_Pipeline_ACV": "${:,.0f}"
-    }), use_container_width=True)
+    paged_table(grouped.drop(columns=[f"{col} Band" for col in BANDS]), "rep_scorecards/detailed",
+                ["Opportunity Owner", "Segment"], column_config)
@@ -1,60 +1,74 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-from data_loader import load_data
+from data_loader import QUARTER_COLUMNS, load_data
+from filters import cascading_multiselects, get_facets, get_index
+from cube import grouped_metrics
+import charts
+import result_cache
+from profiler import dataframe, plotly_chart, record, stage
+
+# Rows without an ACV are always dropped here (as by the ACV slider at full range).
+HAS_ACV = {"Has ACV": [True]}
+FILTER_COLUMNS = ["Opportunity Owner", "Segment", "Type", "Source", "Inbound Type", "Created Quarter", "Close Quarter", "Deal Size Band", "Source File"]
+DIMENSIONS = ["Close Quarter", "Opportunity Owner", "Segment", "Type", "Source", "Inbound Type", "Deal Size Band"]
+METRICS = [
+    "Bookings_ACV", "Total_ACV", "Win_Count", "Total_Count",
+    "Avg_Deal_Size", "Avg_Sales_Cycle", "Deal_Velocity",
+]
+
+
+def compute(df, spec):
+    """Revenue metrics for the opportunities selected by ``spec``.
+
+    ``spec`` keys (all optional): ``filters`` ({column: values}), ``acv_range``
+    ((low, high); None means the full range, which still drops rows without an
+    ACV) and ``dims`` (X-axis, color, facet row; blanks are skipped).
+    Returns ``{"grouped": frame}`` with one row per dimension combination.
+    """
+    record(spec=spec, rows_in=len(df))
+    selections = spec.get("filters", {})
+    acv_range = spec.get("acv_range")
+    dimensions = [dim for dim in spec.get("dims", ["Close Quarter"]) if dim and dim in df.columns]
+
+    with stage("aggregate"):
+        df_grouped = grouped_metrics(df, dimensions, METRICS, selections, acv_range, has_acv=True).reset_index()
+    record(rows_selected=int(df_grouped["Total_Count"].sum()))
+
+    df_grouped["Win Rate (ACV)"] = (df_grouped["Bookings_ACV"] / df_grouped["Total_ACV"]).fillna(0)
+    df_grouped["Win Rate (Count)"] = (df_grouped["Win_Count"] / df_grouped["Total_Count"]).fillna(0)
+
+    for col in df_grouped.columns:
+        if col in QUARTER_COLUMNS:
+            df_grouped[col] = df_grouped[col].astype(str)
+
+    record(rows_out=len(df_grouped))
+    return {"grouped": df_grouped}
+
 
 def render():
-    df = load_data()
+    with stage("load_data"):
+        df = load_data()
+    with stage("filter"):
+        index = get_index(df)
+        facets = get_facets(df)
     st.header("📈 Revenue Metrics")
 
     with st.sidebar:
         st.subheader("🔍 Filters")
-        owners = st.multiselect("Opportunity Owner", df["Opportunity Owner"].dropna().unique())
-        segments = st.multiselect("Segment", df["Segment"].dropna().unique())
-        types = st.multiselect("Type", df["Type"].dropna().unique())
-        sources = st.multiselect("Source", df["Source"].dropna().unique())
-        inbound = st.multiselect("Inbound Type", df["Inbound Type"].dropna().unique())
-        created_qtrs = st.multiselect("Created Quarter", df["Created Quarter"].dropna().astype(str).unique())
-        close_qtrs = st.multiselect("Close Quarter", df["Close Quarter"].dropna().astype(str).unique())
-        bands = st.multiselect("Deal Size Band", df["Deal Size Band"].dropna().unique())
-        acv_min, acv_max = float(df["Base Annual Contract Value"].min()), float(df["Base Annual Contract Value"].max())
+        selections = cascading_multiselects(facets, FILTER_COLUMNS, key="revenue_metrics", where=HAS_ACV)
+        acv_min, acv_max = index.acv_bounds()
         acv_range = st.slider("Base Annual Contract Value Range", min_value=acv_min, max_value=acv_max, value=(acv_min, acv_max))
 
         st.subheader("📊 Dimensions")
-        options = ["Close Quarter", "Opportunity Owner", "Segment", "Type", "Source", "Inbound Type", "Deal Size Band"]
-        dim1 = st.selectbox("X-Axis (default: Close Quarter)", options, index=0)
-        dim2 = st.selectbox("Color Grouping", [""] + options, index=0)
-        dim3 = st.selectbox("Facet Row (Optional)", [""] + options, index=0)
-
-    df_filtered = df.copy()
-    if owners: df_filtered = df_filtered[df_filtered["Opportunity Owner"].isin(owners)]
-    if segments: df_filtered = df_filtered[df_filtered["Segment"].isin(segments)]
-    if types: df_filtered = df_filtered[df_filtered["Type"].isin(types)]
-    if sources: df_filtered = df_filtered[df_filtered["Source"].isin(sources)]
-    if inbound: df_filtered = df_filtered[df_filtered["Inbound Type"].isin(inbound)]
-    if created_qtrs: df_filtered = df_filtered[df_filtered["Created Quarter"].astype(str).isin(created_qtrs)]
-    if close_qtrs: df_filtered = df_filtered[df_filtered["Close Quarter"].astype(str).isin(close_qtrs)]
-    if bands: df_filtered = df_filtered[df_filtered["Deal Size Band"].isin(bands)]
-    df_filtered = df_filtered[df_filtered["Base Annual Contract Value"].between(*acv_range)]
-
-    dimensions = [dim for dim in [dim1, dim2, dim3] if dim and dim in df_filtered.columns]
-
-    df_grouped = df_filtered.groupby(dimensions).agg(
-        Bookings_ACV=pd.NamedAgg(column="Base Annual Contract Value", aggfunc=lambda x: x[df_filtered.loc[x.index, "Is_Won"]].sum()),
-        Total_ACV=pd.NamedAgg(column="Base Annual Contract Value", aggfunc="sum"),
-        Win_Count=pd.NamedAgg(column="Is_Won", aggfunc="sum"),
-        Total_Count=pd.NamedAgg(column="Is_Won", aggfunc="count"),
-        Avg_Deal_Size=pd.NamedAgg(column="Base Annual Contract Value", aggfunc=lambda x: x[df_filtered.loc[x.index, "Is_Won"]].mean()),
-        Avg_Sales_Cycle=pd.NamedAgg(column="Close Date", aggfunc=lambda x: (df_filtered.loc[x.index, "Close Date"] - df_filtered.loc[x.index, "Created Date"]).dt.days.mean()),
-        Deal_Velocity=pd.NamedAgg(column="Deal Velocity (Days)", aggfunc="mean")
-    ).reset_index()
+        dim1 = st.selectbox("X-Axis (default: Close Quarter)", DIMENSIONS, index=0)
+        dim2 = st.selectbox("Color Grouping", [""] + DIMENSIONS, index=0)
+        dim3 = st.selectbox("Facet Row (Optional)", [""] + DIMENSIONS, index=0)
 
-    df_grouped["Win Rate (ACV)"] = (df_grouped["Bookings_ACV"] / df_grouped["Total_ACV"]).fillna(0)
-    df_grouped["Win Rate (Count)"] = (df_grouped["Win_Count"] / df_grouped["Total_Count"]).fillna(0)
-
-    for col in df_grouped.columns:
-        if pd.api.types.is_period_dtype(df_grouped[col]):
-            df_grouped[col] = df_grouped[col].astype(str)
+    spec = {
+        "filters": selections,
+        "acv_range": None if acv_range == (acv_min, acv_max) else acv_range,
+        "dims": [dim1, dim2, dim3],
+    }
+    df_grouped = result_cache.results("revenue_metrics", df, spec, compute)["grouped"]
 
     chart_list = [
         ("Bookings_ACV", "Bookings ACV"),
@@ -66,17 +80,27 @@ def render():
         ("Total_Count", "Total Opportunity Count")
     ]
 
-    for y_col, title in chart_list:
-        fig = px.bar(
-            df_grouped,
-            x=dim1,
-            y=y_col,
-            color=dim2 if dim2 else None,
-            facet_row=dim3 if dim3 else None,
-            barmode="group",
-            title=f"{title} by {dim1}" + (f" colored by {dim2}" if dim2 else "")
-        )
-        st.plotly_chart(fig, use_container_width=True)
+    import plotly.express as px  # deferred until a chart is drawn
+    for i, (y_col, title) in enumerate(chart_list):
+        section = charts.section(title, key=f"revenue_metrics:{y_col}", expanded=i == 0)
+        if not section.open:
+            continue
+        rows, note = charts.cap_points(df_grouped, [dim1, dim2, dim3], y_col)
+        title = f"{title} by {dim1}" + (f" colored by {dim2}" if dim2 else "")
+        with section:
+            with stage("figure"):
+                fig = charts.figure("revenue_metrics", df, y_col, rows, lambda: px.bar(
+                    rows,
+                    x=dim1,
+                    y=y_col,
+                    color=dim2 if dim2 else None,
+                    facet_row=dim3 if dim3 else None,
+                    barmode="group",
+                    title=title
+                ), dims=[dim1, dim2, dim3], title=title)
+            plotly_chart(fig, use_container_width=True)
+            if note:
+                st.caption(note)
 
     df_formatted = df_grouped.copy()
     if "Bookings_ACV" in df_formatted:
@@ -94,4 +118,4 @@ def render():
     if "Win Rate (Count)" in df_formatted:
         df_formatted["Win Rate (Count)"] = (df_grouped["Win Rate (Count)"] * 100).round(1).map("{:.1f}%".format)
 
-    st.dataframe(df_formatted)
+    dataframe(df_formatted)
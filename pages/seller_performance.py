@@ -1,87 +1,192 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
+import numpy as np
 from data_loader import load_data
+from cube import get_cube, rollup
+from filters import cascading_multiselects, get_facets
+from profiler import dataframe, plotly_chart, record, stage
+import charts
+import result_cache
 
-def render():
-    st.header("📈 Seller Performance (vs Segment Peers)")
-    df = load_data()
+FILTER_COLUMNS = ["Opportunity Owner", "Segment", "Source", "Reference Quarter", "Source File"]
+KEYS = ["Segment", "Opportunity Owner", "Reference Quarter"]
+COMPARED = {"Bookings_ACV": "Bookings", "Pipeline_ACV": "Pipeline"}
+# Additive cube measures summed over the trailing window; averages are derived afterwards.
+TOTALS = {"Bookings_ACV": "Bookings_ACV", "Pipeline_ACV": "Pipeline_Generated_ACV",
+          "Pipeline_Count": "Pipeline_Count", "Row_Count": "Total_Count"}
+WINDOWS = {"Quarter": 1, "Trailing 2 quarters": 2, "Trailing 4 quarters": 4}
+HEATMAP_VALUES = {
+    "% Δ vs segment avg": ("_Delta", ".1%", "% Δ vs Segment Avg"),
+    "Percentile in segment": ("_Pctile", ".0%", "Percentile in Segment"),
+    "Z-score in segment": ("_Z", ".2f", "Z-score in Segment"),
+}
 
-    df["Reference Quarter"] = df["Created Quarter"].combine_first(df["Close Quarter"]).astype(str)
-    df["Created Quarter"] = df["Created Quarter"].astype(str)
-    df["Close Quarter"] = df["Close Quarter"].astype(str)
 
-    with st.sidebar:
-        st.subheader("Filters")
-        owners = st.multiselect("Opportunity Owner", df["Opportunity Owner"].dropna().unique())
-        segments = st.multiselect("Segment", df["Segment"].dropna().unique())
-        sources = st.multiselect("Source", df["Source"].dropna().unique())
-        ref_qtrs = st.multiselect("Reference Quarter", df["Reference Quarter"].dropna().unique())
+def _trailing(cells, window):
+    """Sum every measure over each seller's trailing ``window`` calendar quarters.
+
+    Quarters without activity count as zero; cells whose window holds no
+    opportunities are dropped.
+    """
+    quarters = cells.index.get_level_values("Reference Quarter")
+    span = pd.period_range(quarters.min(), quarters.max(), freq="Q").astype(str).rename("Reference Quarter")
+    rolled = pd.DataFrame({
+        name: cells[name].unstack(fill_value=0).reindex(columns=span, fill_value=0)
+        .T.rolling(window, min_periods=1).sum().T.stack()
+        for name in cells.columns
+    })
+    return rolled[rolled["Row_Count"] > 0]
+
+
+def compare_to_peers(cells):
+    """Add segment baselines, deltas, percentile ranks and z-scores to per-seller ``cells``.
+
+    One groupby over (Segment, Reference Quarter) serves every statistic, each
+    broadcast back to the sellers with ``transform``, so no baseline frame is
+    built and merged back.
+    """
+    peers = cells.groupby(["Segment", "Reference Quarter"], observed=True)[list(COMPARED)]
+    mean, std, pct = peers.transform("mean"), peers.transform("std", ddof=0), peers.rank(pct=True)
+    for metric, label in COMPARED.items():
+        cells[f"{label}_Baseline"] = mean[metric]
+        cells[f"{metric}_Delta"] = ((cells[metric] - mean[metric]) / mean[metric]).round(2)
+        cells[f"{metric}_Pctile"] = pct[metric]
+        cells[f"{metric}_Z"] = ((cells[metric] - mean[metric]) / std[metric].replace(0, np.nan)).round(2)
+    return cells
+
+
+def compute(df, spec):
+    """Seller vs segment-peer comparison for the opportunities selected by ``spec``.
+
+    ``spec`` keys (all optional): ``filters`` ({column: values}) and
+    ``window`` (trailing quarters summed per cell, default 1). Returns
+    ``performance`` (segment x seller x quarter with baselines, deltas,
+    percentiles and z-scores) and ``by_seller`` (one row per seller).
+    """
+    record(spec=spec, rows_in=len(df))
+    filters = dict(spec.get("filters", {}))
+    # Applied after the window so trailing sums still see earlier quarters.
+    quarters = filters.pop("Reference Quarter", [])
+    with stage("aggregate"):
+        cells = rollup(get_cube(df), KEYS, TOTALS, filters)
+        if spec.get("window", 1) > 1 and len(cells):
+            windowed = _trailing(cells, spec["window"])
+        else:
+            windowed = cells
+        if len(quarters):
+            cells = cells[cells.index.get_level_values("Reference Quarter").isin(quarters)]
+            windowed = windowed[windowed.index.get_level_values("Reference Quarter").isin(quarters)]
 
-    if owners: df = df[df["Opportunity Owner"].isin(owners)]
-    if segments: df = df[df["Segment"].isin(segments)]
-    if sources: df = df[df["Source"].isin(sources)]
-    if ref_qtrs: df = df[df["Reference Quarter"].isin(ref_qtrs)]
+        merged = windowed.assign(Avg_Deal_Size=windowed["Pipeline_ACV"] / windowed["Pipeline_Count"])
+        merged = compare_to_peers(merged.drop(columns=["Pipeline_Count", "Row_Count"])).reset_index()
 
-    df["Bookings_ACV"] = df.apply(lambda x: x["Base Annual Contract Value"] if x["Is_Won"] else 0, axis=1)
-    df["Pipeline_ACV"] = df["Base Annual Contract Value"]
+        agg = cells.assign(Avg_Deal_Size=cells["Pipeline_ACV"] / cells["Pipeline_Count"]).groupby(
+            "Opportunity Owner", observed=True
+        ).agg(
+            Bookings_ACV=("Bookings_ACV", "sum"),
+            Pipeline_ACV=("Pipeline_ACV", "sum"),
+            Avg_Deal_Size=("Avg_Deal_Size", "mean")
+        ).reset_index()
 
-    grouped = df.groupby(["Segment", "Opportunity Owner", "Reference Quarter"]).agg(
-        Bookings_ACV=("Bookings_ACV", "sum"),
-        Pipeline_ACV=("Pipeline_ACV", "sum"),
-        Avg_Deal_Size=("Base Annual Contract Value", "mean")
-    ).reset_index()
+    record(rows_out=len(merged))
+    return {"performance": merged, "by_seller": agg}
 
-    # Segment baselines per quarter
-    seg_qtr_avg = grouped.groupby(["Segment", "Reference Quarter"])[["Bookings_ACV", "Pipeline_ACV"]].mean().reset_index()
-    seg_qtr_avg.rename(columns={"Bookings_ACV": "Bookings_Baseline", "Pipeline_ACV": "Pipeline_Baseline"}, inplace=True)
 
-    merged = pd.merge(grouped, seg_qtr_avg, on=["Segment", "Reference Quarter"], how="left")
+def visible_sellers(by_seller, rank_by, view, size, page=1):
+    """Sellers to draw: the top or bottom ``size`` by ``rank_by``, or one page of all sellers ranked by it."""
+    if view == "Top":
+        return by_seller.nlargest(size, rank_by)["Opportunity Owner"].tolist()
+    if view == "Bottom":
+        return by_seller.nsmallest(size, rank_by)["Opportunity Owner"].tolist()
+    ranked = by_seller.sort_values(rank_by, ascending=False, kind="stable")
+    return ranked["Opportunity Owner"].iloc[(page - 1) * size: page * size].tolist()
 
-    for metric, baseline in [("Bookings_ACV", "Bookings_Baseline"), ("Pipeline_ACV", "Pipeline_Baseline")]:
-        merged[f"{metric}_Delta"] = ((merged[metric] - merged[baseline]) / merged[baseline]).round(2)
 
+def render():
+    st.header("📈 Seller Performance (vs Segment Peers)")
+    with stage("load_data"):
+        df = load_data()
+    with stage("filter"):
+        facets = get_facets(df)
+
+    with st.sidebar:
+        st.subheader("Filters")
+        selections = cascading_multiselects(facets, FILTER_COLUMNS, key="seller_performance")
+
+        st.subheader("Comparison")
+        window = WINDOWS[st.selectbox("Window", list(WINDOWS))]
+        rank_by = st.selectbox("Rank sellers by", list(COMPARED))
+        view = st.radio("Sellers shown", ["Top", "Bottom", "All (paged)"], horizontal=True)
+        size = st.slider("Sellers per view", min_value=5, max_value=50, value=15, step=5)
+        heat_value = st.selectbox("Heatmap value", list(HEATMAP_VALUES))
+
+    spec = {"filters": selections, "window": window}
+    results = result_cache.results("seller_performance", df, spec, compute)
+    merged, agg = results["performance"], results["by_seller"]
+
+    page = 1
+    if view == "All (paged)":
+        pages = max(1, -(-len(agg) // size))
+        page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, step=1)
+    sellers = visible_sellers(agg, rank_by, view, size, page)
+    st.caption(f"Showing {len(sellers)} of {len(agg):,} sellers, ranked by {rank_by}.")
+    shown = merged[merged["Opportunity Owner"].isin(sellers)]
+
+    import plotly.express as px  # deferred until a chart is drawn
     # Heatmaps (flipped, red→green)
-    for metric in ["Bookings_ACV_Delta", "Pipeline_ACV_Delta"]:
-        heat = merged.pivot(index="Reference Quarter", columns="Opportunity Owner", values=metric)
-        fig = px.imshow(
-            heat,
-            text_auto=".1%",
-            color_continuous_scale="RdYlGn",
-            origin="lower",
-            height=700,
-            title=f"{metric.replace('_Delta','')} % Delta vs Segment Avg",
-            labels=dict(x="Seller", y="Quarter", color="% Δ vs Segment Avg")
-        )
-        st.plotly_chart(fig, use_container_width=True)
+    suffix, text_format, color_label = HEATMAP_VALUES[heat_value]
+    section = charts.section("Heatmaps vs segment peers", key="seller_performance:heatmaps", expanded=True)
+    if section.open:
+        with section:
+            for metric in COMPARED:
+                with stage("figure"):
+                    fig = charts.figure("seller_performance", df, f"heatmap/{metric}", shown, lambda: px.imshow(
+                        shown.pivot(index="Reference Quarter", columns="Opportunity Owner", values=metric + suffix)
+                        .reindex(columns=sellers),
+                        text_auto=text_format,
+                        color_continuous_scale="RdYlGn",
+                        origin="lower",
+                        height=700,
+                        title=f"{metric.replace('_ACV', '')} {heat_value}",
+                        labels=dict(x="Seller", y="Quarter", color=color_label)
+                    ), sellers=sellers, heat_value=heat_value)
+                plotly_chart(fig, use_container_width=True)
 
     # Trend charts by seller
-    for metric in ["Bookings_ACV", "Pipeline_ACV"]:
-        st.subheader(f"{metric} over Time (Colored by Seller)")
-        fig = px.bar(
-            merged,
-            x="Reference Quarter", y=metric,
-            color="Opportunity Owner",
-            barmode="group",
-            title=f"{metric} per Seller per Quarter"
-        )
-        st.plotly_chart(fig, use_container_width=True)
-
-    # Scatter Plot: one dot per seller
-    st.subheader("🔍 Bookings vs Pipeline (1 Bubble per Seller)")
-    agg = merged.groupby("Opportunity Owner").agg(
-        Bookings_ACV=("Bookings_ACV", "sum"),
-        Pipeline_ACV=("Pipeline_ACV", "sum"),
-        Avg_Deal_Size=("Avg_Deal_Size", "mean")
-    ).reset_index()
-
-    fig = px.scatter(
-        agg,
-        x="Pipeline_ACV",
-        y="Bookings_ACV",
-        size="Avg_Deal_Size",
-        color="Opportunity Owner",
-        title="Bookings vs Pipeline (Bubble = Avg Deal Size)",
-        labels=dict(Pipeline_ACV="Pipeline ACV", Bookings_ACV="Bookings ACV")
-    )
-    st.plotly_chart(fig, use_container_width=True)
+    section = charts.section("Trends over time (colored by seller)", key="seller_performance:trends")
+    if section.open:
+        with section:
+            for metric in COMPARED:
+                st.subheader(f"{metric} over Time (Colored by Seller)")
+                with stage("figure"):
+                    fig = charts.figure("seller_performance", df, f"trend/{metric}", shown, lambda: px.bar(
+                        shown,
+                        x="Reference Quarter", y=metric,
+                        color="Opportunity Owner",
+                        category_orders={"Opportunity Owner": sellers},
+                        barmode="group",
+                        title=f"{metric} per Seller per Quarter"
+                    ), sellers=sellers)
+                plotly_chart(fig, use_container_width=True)
+
+    st.subheader("Peer Comparison")
+    dataframe(shown.sort_values(["Reference Quarter", f"{rank_by}_Pctile"], ascending=[True, False]), hide_index=True)
+
+    # Scatter Plot: one dot per seller, in two traces however many sellers there are
+    section = charts.section("🔍 Bookings vs Pipeline (1 Bubble per Seller)", key="seller_performance:scatter")
+    if section.open:
+        points = agg.assign(Shown=np.where(agg["Opportunity Owner"].isin(sellers), "Shown above", "Other sellers"))
+        with section:
+            with stage("figure"):
+                fig = charts.figure("seller_performance", df, "scatter", points, lambda: px.scatter(
+                    points,
+                    x="Pipeline_ACV",
+                    y="Bookings_ACV",
+                    size="Avg_Deal_Size",
+                    color="Shown",
+                    hover_name="Opportunity Owner",
+                    render_mode=charts.render_mode(len(points)),
+                    title="Bookings vs Pipeline (Bubble = Avg Deal Size)",
+                    labels=dict(Pipeline_ACV="Pipeline ACV", Bookings_ACV="Bookings ACV", Shown="")
+                ))
+            plotly_chart(fig, use_container_width=True)
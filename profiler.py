@@ -0,0 +1,135 @@
+"""Opt-in per-render timing of load, filter, aggregate, figure and serialize stages.
+
+Stages are timed only inside ``profile_render``; elsewhere ``stage`` and
+``record`` are no-ops, so compute functions stay usable headless. Each
+profiled render appends one JSON line to LOG_PATH.
+"""
+import contextvars
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import streamlit as st
+
+ENABLED = os.environ.get("DASHBOARD_PROFILE") == "1"
+LOG_PATH = os.environ.get("DASHBOARD_PROFILE_LOG", os.path.join("logs", "render_profile.jsonl"))
+STAGES = ["load_data", "filter", "aggregate", "figure", "serialize"]
+
+_current = contextvars.ContextVar("render_profile", default=None)
+_collected = contextvars.ContextVar("collected_fields", default=None)
+
+
+class RenderProfile:
+    def __init__(self, page):
+        self.page = page
+        self.stages_ms = {}
+        self.fields = {}
+        self.total_ms = None
+        self.peak_memory_mb = None
+
+    def as_record(self):
+        return {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+            "page": self.page,
+            **self.fields,
+            "stages_ms": {name: round(ms, 2) for name, ms in self.stages_ms.items()},
+            "total_ms": round(self.total_ms, 2),
+            "peak_memory_mb": self.peak_memory_mb,
+        }
+
+
+@contextmanager
+def stage(name):
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.stages_ms[name] = profile.stages_ms.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+
+def record(**fields):
+    """Attach fields (spec, row counts) to the render being profiled and to any ``collect`` block."""
+    profile = _current.get()
+    if profile is not None:
+        profile.fields.update(fields)
+    collected = _collected.get()
+    if collected is not None:
+        collected.update(fields)
+
+
+@contextmanager
+def collect():
+    """Yield a dict of the fields recorded inside the block, whether or not a render is profiled."""
+    fields = {}
+    token = _collected.set(fields)
+    try:
+        yield fields
+    finally:
+        _collected.reset(token)
+
+
+@contextmanager
+def profile_render(page, enabled=ENABLED):
+    """Profile everything run inside the block; yields the RenderProfile or None.
+
+    Peak memory comes from tracemalloc, which is process-wide, so concurrent
+    profiled sessions inflate each other's peaks.
+    """
+    if not enabled:
+        yield None
+        return
+
+    profile = RenderProfile(page)
+    token = _current.set(profile)
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    try:
+        yield profile
+    finally:
+        profile.total_ms = (time.perf_counter() - start) * 1000
+        profile.peak_memory_mb = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+        if started_tracing:
+            tracemalloc.stop()
+        _current.reset(token)
+        _append_log(profile.as_record())
+
+
+def _append_log(entry):
+    try:
+        os.makedirs(os.path.dirname(LOG_PATH) or ".", exist_ok=True)
+        with open(LOG_PATH, "a") as f:
+            f.write(json.dumps(entry, default=str) + "\n")
+    except OSError:
+        pass
+
+
+def plotly_chart(fig, **kwargs):
+    with stage("serialize"):
+        st.plotly_chart(fig, **kwargs)
+
+
+def dataframe(data, **kwargs):
+    with stage("serialize"):
+        st.dataframe(data, **kwargs)
+
+
+def render_panel(profile):
+    """Sidebar breakdown of the last profiled render."""
+    with st.sidebar.expander("⏱ Render profile", expanded=True):
+        other = profile.total_ms - sum(profile.stages_ms.values())
+        rows = [(name, profile.stages_ms.get(name, 0.0)) for name in STAGES] + [("other", max(other, 0.0))]
+        st.dataframe({"Stage": [r[0] for r in rows], "ms": [round(r[1], 1) for r in rows]}, hide_index=True)
+        st.caption(
+            f"Total {profile.total_ms:,.0f} ms · peak {profile.peak_memory_mb:,.1f} MB · "
+            f"rows in/selected/out: {profile.fields.get('rows_in')}/{profile.fields.get('rows_selected')}/{profile.fields.get('rows_out')}"
+        )
@@ -0,0 +1,134 @@
+"""Process-wide LRU cache of page results and figures, shared by all sessions.
+
+Entries are keyed by page, dataset version and the canonical form of the
+compute spec, so equivalent sidebar states (the same multiselect values in a
+different order, empty selections left out) share one entry. The cache is
+emptied when the dataset version changes and evicts least recently used
+entries beyond DASHBOARD_CACHE_MB (default 256; 0 disables it).
+"""
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from profiler import collect, record
+
+MAX_BYTES = int(float(os.environ.get("DASHBOARD_CACHE_MB", 256)) * 2**20)
+# Spec keys whose list order matters (chart positions, range bounds); other lists are sets.
+ORDERED_KEYS = {"dims", "acv_range", "sellers"}
+
+
+def canonical_spec(spec):
+    """JSON string identifying ``spec`` up to multiselect order and empty selections."""
+    def norm(key, value):
+        if isinstance(value, dict):
+            return {k: norm(k, v) for k, v in value.items() if not (isinstance(v, (list, tuple)) and not len(v))}
+        if isinstance(value, (list, tuple)):
+            items = [norm(None, v) for v in value]
+            return items if key in ORDERED_KEYS else sorted(items, key=str)
+        return value
+    return json.dumps(norm(None, spec), sort_keys=True, default=str)
+
+
+def _size(value):
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, dict):
+        return sum(_size(v) for v in value.values())
+    if isinstance(value, (tuple, list)):
+        return sum(_size(v) for v in value)
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    """Size-bounded LRU mapping for one dataset version at a time."""
+
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.version = None
+        self.hits = self.misses = self.evictions = 0
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, version, key):
+        with self._lock:
+            if version != self.version:
+                self._reset(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, version, key, value):
+        size = _size(value)
+        with self._lock:
+            if version != self.version or size > self.max_bytes:
+                return
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._bytes -= self._entries.popitem(last=False)[1][1]
+                self.evictions += 1
+
+    def _reset(self, version):
+        self.version = version
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "entries": len(self._entries), "bytes": self._bytes}
+
+
+CACHE = ResultCache()
+
+
+def results(page, df, spec, compute):
+    """``compute(df, spec)``, served from the cache when an equivalent spec was computed.
+
+    Frames are returned as shallow copies, so callers may add or replace
+    columns without touching the cached result. The profiler fields
+    ``compute`` records (spec, row counts) are kept with the result and
+    recorded again on a hit.
+    """
+    version = df.attrs.get("version")
+    if version is None or not CACHE.max_bytes:
+        return compute(df, spec)
+    key = (page, "results", canonical_spec(spec))
+    entry = CACHE.get(version, key)
+    record(result_cache="hit" if entry is not None else "miss")
+    if entry is None:
+        with collect() as fields:
+            value = compute(df, spec)
+        entry = (value, fields)
+        CACHE.put(version, key, entry)
+    value, fields = entry
+    record(**{**fields, "spec": spec, "rows_in": len(df)})
+    return {name: frame.copy(deep=False) for name, frame in value.items()}
+
+
+def figure(page, df, spec, name, build):
+    """Figure ``name`` for ``spec``: ``build()`` on a miss, else rebuilt from its cached JSON."""
+    version = df.attrs.get("version")
+    if version is None or not CACHE.max_bytes:
+        return build()
+    key = (page, "figure", name, canonical_spec(spec))
+    cached = CACHE.get(version, key)
+    if cached is not None:
+        import plotly.io as pio  # deferred until a chart is drawn
+        return pio.from_json(cached, skip_invalid=True)
+    fig = build()
+    CACHE.put(version, key, fig.to_json())
+    return fig
@@ -0,0 +1,68 @@
+"""Break down dashboard cold-start cost by imported module.
+
+Each target is imported in a fresh interpreter with ``-X importtime`` so the
+numbers are what a new replica pays. Usage:
+
+    python startup_report.py [--top N]
+"""
+import argparse
+import glob
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+BASE_TARGETS = ["streamlit", "pandas", "pyarrow", "plotly.express", "data_loader"]
+
+
+def page_modules():
+    return sorted(
+        "pages." + os.path.splitext(os.path.basename(path))[0]
+        for path in glob.glob(os.path.join(ROOT, "pages", "*.py"))
+    )
+
+
+def import_times(module):
+    """Return [(name, self_us, cumulative_us)] for everything ``import module`` loads."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr.strip().splitlines()[-1]}")
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def report(top=15):
+    pages = page_modules()
+
+    print("Cold import time per module (fresh interpreter each)")
+    for target in BASE_TARGETS + pages:
+        try:
+            rows = import_times(target)
+        except RuntimeError as e:
+            print(f"  {target:<32} {'n/a':>10}  ({e})")
+            continue
+        total = next((cum for name, _, cum in reversed(rows) if name == target), 0)
+        print(f"  {target:<32} {total / 1000:>8.1f} ms")
+
+    # What a replica pays to serve its first request: streamlit plus the page modules.
+    by_package = defaultdict(int)
+    for name, self_us, _ in import_times(", ".join(["streamlit"] + pages)):
+        by_package[name.split(".")[0]] += self_us
+    print(f"\nTop {top} packages by self time (streamlit + all pages, {sum(by_package.values()) / 1000:.1f} ms total)")
+    for package, self_us in sorted(by_package.items(), key=lambda kv: -kv[1])[:top]:
+        print(f"  {package:<32} {self_us / 1000:>8.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--top", type=int, default=15)
+    report(parser.parse_args().top)
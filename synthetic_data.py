@@ -0,0 +1,100 @@
+"""Generate opportunity exports shaped like data.csv at arbitrary scale.
+
+Rows are bootstrapped from the shipped data.csv so the joint distribution of
+owner, segment, source, stage and stage stamps is preserved. Each sampled row
+gets its dates shifted together by a random number of days (re-rendered in the
+cell's original format) and its ACV jittered. Blank cells stay blank. Usage:
+
+    python synthetic_data.py ROWS [--out PATH] [--owners N] [--seed S]
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_loader import DATA_PATH, DATE_COLUMNS, parse_dates
+
+CHUNK_ROWS = 250_000
+MAX_SHIFT_DAYS = 90
+ACV_SIGMA = 0.25
+# Share of ACV cells written with a "$" prefix, as some exports do.
+DOLLAR_SHARE = 0.5
+
+
+def _format_dates(values, ampm):
+    """Render timestamps like the export: "2/22/2024 11:15:00" or "3/14/2024, 7:34 AM"."""
+    codes, uniques = pd.factorize(pd.Series(values))
+    rendered = []
+    for ts in uniques:
+        if ampm:
+            hour = ts.hour % 12 or 12
+            rendered.append(f"{ts.month}/{ts.day}/{ts.year}, {hour}:{ts.minute:02d} {'AM' if ts.hour < 12 else 'PM'}")
+        else:
+            rendered.append(f"{ts.month}/{ts.day}/{ts.year} {ts.hour}:{ts.minute:02d}:{ts.second:02d}")
+    return np.append(np.array(rendered, dtype=object), "")[codes]
+
+
+def _format_acv(values, dollar):
+    """Render ACVs as "45,000.00", or "$45,000.00" where ``dollar`` is set; NaN stays blank."""
+    return np.array(
+        ["" if np.isnan(v) else f"{'$' if d else ''}{v:,.2f}" for v, d in zip(values, dollar)], dtype=object
+    )
+
+
+class Template:
+    def __init__(self, path=DATA_PATH):
+        self.raw = pd.read_csv(path, dtype=str, keep_default_na=False)
+        self.dates = {col: parse_dates(self.raw[col]).to_numpy() for col in DATE_COLUMNS}
+        self.ampm = {col: self.raw[col].str.contains("M", regex=False).to_numpy() for col in DATE_COLUMNS}
+        self.acv = pd.to_numeric(
+            self.raw["Base Annual Contract Value"].str.replace(r"[\$,]", "", regex=True), errors="coerce"
+        ).to_numpy()
+
+    def sample(self, n, rng, owners=None):
+        rows = rng.integers(0, len(self.raw), n)
+        out = self.raw.iloc[rows].reset_index(drop=True)
+
+        shift = rng.integers(-MAX_SHIFT_DAYS, MAX_SHIFT_DAYS + 1, n).astype("timedelta64[D]")
+        for col in DATE_COLUMNS:
+            shifted = self.dates[col][rows] + shift
+            ampm = self.ampm[col][rows]
+            rendered = np.empty(n, dtype=object)
+            rendered[ampm] = _format_dates(shifted[ampm], ampm=True)
+            rendered[~ampm] = _format_dates(shifted[~ampm], ampm=False)
+            out[col] = rendered
+
+        acv = np.round(self.acv[rows] * rng.lognormal(0.0, ACV_SIGMA, n), 2)
+        out["Base Annual Contract Value"] = _format_acv(acv, rng.random(n) < DOLLAR_SHARE)
+
+        if owners:
+            # Clone each template owner into ``owners`` total reps, keeping their segment mix.
+            clones = -(-owners // self.raw["Opportunity Owner"].nunique())
+            clone_id = rng.integers(0, clones, n)
+            suffix = np.where(clone_id > 0, " " + clone_id.astype(str), "")
+            out["Opportunity Owner"] = out["Opportunity Owner"].to_numpy(dtype=object) + suffix
+        return out
+
+
+def generate(n_rows, out_path, owners=None, seed=0, template_path=DATA_PATH):
+    rng = np.random.default_rng(seed)
+    template = Template(template_path)
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    tmp = out_path + ".tmp"
+    written = 0
+    while written < n_rows:
+        n = min(CHUNK_ROWS, n_rows - written)
+        template.sample(n, rng, owners).to_csv(tmp, mode="w" if written == 0 else "a", header=written == 0, index=False)
+        written += n
+    os.replace(tmp, out_path)
+    return out_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("rows", type=int)
+    parser.add_argument("--out", help="default: bench_data/opportunities_<rows>.csv")
+    parser.add_argument("--owners", type=int, help="number of reps to spread rows across (default: as in data.csv)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(generate(args.rows, args.out or f"bench_data/opportunities_{args.rows}.csv", args.owners, args.seed))
@@ -0,0 +1,67 @@
+"""Server-side paged tables: search, sort and slice on the server, send one page.
+
+Threshold highlighting is a vectorised category column (``bands``) rather
+than a pandas Styler, so no Python runs per cell and the browser only
+receives the visible rows.
+"""
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from profiler import dataframe, stage
+
+BAND_LABELS = ["🔴 Low", "🟡 Mid", "🟢 High"]
+PAGE_SIZES = [25, 50, 100, 250]
+
+
+def bands(values, low, high, labels=BAND_LABELS):
+    """Ordered categorical: ``labels[0]`` below ``low``, ``labels[2]`` above ``high``, else ``labels[1]``."""
+    values = np.asarray(values, dtype="float64")
+    return pd.Categorical(
+        np.select([values < low, values > high], [labels[0], labels[2]], labels[1]),
+        categories=labels, ordered=True,
+    )
+
+
+def search_rows(frame, search, columns):
+    """Rows of ``frame`` where any of ``columns`` contains ``search``, ignoring case."""
+    if not search:
+        return frame
+    hit = np.zeros(len(frame), dtype=bool)
+    for col in columns:
+        hit |= frame[col].astype(str).str.contains(search, case=False, regex=False).to_numpy()
+    return frame[hit]
+
+
+def page_of(frame, sort_by=None, ascending=True, page=1, page_size=PAGE_SIZES[0]):
+    """Rows of ``frame`` on ``page`` after a stable sort by ``sort_by``."""
+    if sort_by:
+        frame = frame.sort_values(sort_by, ascending=ascending, kind="stable", na_position="last")
+    start = (page - 1) * page_size
+    return frame.iloc[start:start + page_size]
+
+
+def paged_table(frame, key, search_columns=(), column_config=None):
+    """Draw ``frame`` one page at a time with search, sort and paging controls.
+
+    Controls keep their state in ``st.session_state["<key>:..."]``.
+    """
+    search_col, sort_col, order_col, size_col, page_col = st.columns([3, 3, 1, 1, 1])
+    search = search_col.text_input("Search", key=f"{key}:search", placeholder=" / ".join(search_columns))
+    sort_by = sort_col.selectbox("Sort by", list(frame.columns), key=f"{key}:sort")
+    ascending = order_col.toggle("Ascending", value=True, key=f"{key}:ascending")
+    page_size = size_col.selectbox("Rows", PAGE_SIZES, key=f"{key}:size")
+
+    with stage("filter"):
+        matches = search_rows(frame, search, search_columns)
+    pages = max(1, -(-len(matches) // page_size))
+    if st.session_state.get(f"{key}:page", 1) > pages:
+        st.session_state[f"{key}:page"] = pages
+    page = page_col.number_input("Page", min_value=1, max_value=pages, step=1, key=f"{key}:page")
+
+    with stage("filter"):
+        rows = page_of(matches, sort_by, ascending, page, page_size)
+    dataframe(rows, hide_index=True, column_config=column_config, width="stretch")
+    first = (page - 1) * page_size
+    st.caption(f"Rows {min(first + 1, len(matches)):,}–{first + len(rows):,} of {len(matches):,}"
+               + (f" matching “{search}”" if search else "") + f" · page {page} of {pages}")